@@ -0,0 +1,714 @@
+# -*- coding: utf-8 -*-
+"""The asyncio version of the services.
+
+It needs Python 3.7+ and aiohttp (pip install pywechat[async]).
+
+    service = AsyncWechatService(app_id, app_secret)
+    shake_service = service.init_service('Shake')
+    json_data = await shake_service.get_shake_info(ticket)
+"""
+import asyncio
+import contextlib
+import contextvars
+import time
+
+import aiohttp
+
+from pywechat.bulk import BulkResult, BulkWindow, split_args
+from pywechat.card_catalog import CardCatalog
+from pywechat.device_registry import DeviceRegistry
+from pywechat.excepts import CodeBuildError, RateLimitError, WechatError
+from pywechat.services.basic import Basic
+from pywechat.shake_ticket import ShakeTicketResolver
+from pywechat.services.wechat_card import CardService
+from pywechat.services.wechat_shake import ShakeService
+from pywechat.token_store import MemoryTokenStore
+from pywechat.uploads import Upload
+
+
+def build_connector(pool_maxsize=100, limit_per_host=0, keepalive_timeout=15):
+    """Builds a connector of aiohttp with a pool of keep-alive connections.
+
+    Args:
+        pool_maxsize: the max number of connections.
+        limit_per_host: the max number of connections kept for one host,
+            0 means no limit.
+        keepalive_timeout: the seconds to keep an idle connection alive.
+
+    Returns:
+        the connector of aiohttp.
+    """
+    return aiohttp.TCPConnector(
+        limit=pool_maxsize,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout
+    )
+
+
+async def _aiter(iterable):
+    """Turns an iterable or an asynchronous iterable into the latter."""
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+class _LazySession(object):
+
+    """Builds the session of aiohttp in the running loop when it is needed."""
+
+    def __init__(self, connector_options, session=None):
+        self.connector_options = connector_options
+        self.__session = session
+
+    async def get(self):
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(
+                connector=build_connector(**self.connector_options))
+        return self.__session
+
+    async def close(self):
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+
+
+class AsyncBasic(Basic):
+
+    """The basic class of all asyncio services.
+
+    Every request of the service returns an awaitable instead of the json
+    data, the methods of the services are the same as the blocking ones.
+
+    Attributes:
+        session: the holder of the session of aiohttp, the session is built
+            in the running loop when the first request is sent.
+        connector_options: the options to build the connector of the session.
+    """
+
+    def __init__(
+            self, app_id, app_secret,
+            session=None, connector_options=None, **options):
+        """Initializes the service.
+
+        Args:
+            app_id: the app id of a wechat account.
+            app_secret: the app secret of a wechat account.
+            session: the shared session of aiohttp, or the holder of it.
+            connector_options: the dict of options of build_connector when
+                the session is None.
+            options: the other options of Basic, such as token_store.
+        """
+        self.__app_id = app_id
+        self.__app_secret = app_secret
+        self.connector_options = connector_options or {}
+        self.__async_token_lock = None
+        self.__renewer_service = None
+        self.__rate_limit_timeout = contextvars.ContextVar(
+            'rate_limit_timeout', default=self._UNSET)
+        if not isinstance(session, _LazySession):
+            session = _LazySession(self.connector_options, session)
+        Basic.__init__(self, app_id, app_secret, session=session, **options)
+
+    @property
+    def access_token(self):
+        '''Gets the access token, it is awaitable.'''
+        return self._get_access_token()
+
+    def _get_async_token_lock(self):
+        """Gets the lock which guards the refreshing of the token."""
+        if self.__async_token_lock is None:
+            self.__async_token_lock = asyncio.Lock()
+        return self.__async_token_lock
+
+    async def _get_access_token(self):
+        """Gets the access token, grants it once if it is invalid."""
+        access_token, expires_at = self._load_access_token()
+        if self._is_token_valid(access_token, expires_at):
+            return access_token
+
+        async with self._get_async_token_lock():
+            access_token, expires_at = self._load_access_token()
+            if self._is_token_valid(access_token, expires_at):
+                return access_token
+            await self._grant_access_token()
+            return self._load_access_token()[0]
+
+    async def _send_request(self, method, url, **kwargs):
+        """Sends a request to the server.
+
+        It checks the data by the validator, recovers the invalid access
+        token, retries the failures and reads the response cache like
+        Basic._send_request.
+
+        Args:
+            method: the method of request.('get', 'post', etc)
+            url: the request's url.
+            kwargs: the data will send to.
+
+        Returns:
+            the json data gets from the server.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        data = kwargs.get('data')
+        json_data = self._prepare_request(url, kwargs)
+        if json_data is not None:
+            return json_data
+
+        access_token = None
+        if not kwargs.get('params'):
+            access_token = await self._get_access_token()
+            self._set_access_token(kwargs, access_token)
+        self._encode_request(kwargs)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._acquire_rate_limit(url)
+            started = time.time()
+            try:
+                json_data = await self._send_request_once(method, url, kwargs)
+                break
+            except Exception as e:
+                delay = self._plan_retry(
+                    url, kwargs, e, attempt, started, access_token)
+                if delay is None:
+                    raise
+                if delay is self._REPLAY:
+                    # replays the request once with a new token.
+                    await self._refresh_access_token(access_token)
+                    access_token = None
+                    self._set_access_token(
+                        kwargs, await self._get_access_token())
+                else:
+                    await asyncio.sleep(delay)
+
+        self._handle_response(url, data, started, json_data)
+        return json_data
+
+    async def _send_request_once(self, method, url, kwargs):
+        """Sends a request to the server once.
+
+        Args:
+            method: the method of request.('get', 'post', etc)
+            url: the request's url.
+            kwargs: the encoded data will send to.
+
+        Returns:
+            the json data gets from the server.
+        """
+        kwargs = dict(kwargs)
+        files = kwargs.pop('files', None)
+        if files:
+            form = aiohttp.FormData()
+            for name, value in files.items():
+                form.add_field(name, value)
+            kwargs['data'] = form
+
+        session = await self.session.get()
+        async with session.request(method, url, **kwargs) as response:
+            response.raise_for_status()
+            if self.json_codec is None:
+                json_data = await response.json(content_type=None)
+            else:
+                json_data = self.json_codec.loads(await response.read())
+        self._check_wechat_error(json_data)
+        return json_data
+
+    async def _acquire_rate_limit(self, url):
+        """Takes the tokens of a request from the rate limiter.
+
+        It waits in the loop, see Basic._acquire_rate_limit.
+        """
+        if self.rate_limiter is None:
+            return
+        try:
+            await self.rate_limiter.acquire_async(
+                self.__app_id, url, timeout=self._get_rate_limit_timeout())
+        except RateLimitError:
+            self._count_rate_limited(url)
+            raise
+
+    async def _upload_once(
+            self, url, name, source, filename, kind, url_path):
+        """Uploads a file unless the same content was uploaded.
+
+        See Basic._upload_once.
+        """
+        with Upload(source, filename) as upload:
+            json_data = self._find_upload(kind, upload, url_path)
+            if json_data is None:
+                json_data = await self._send_upload(url, name, upload)
+                self._save_upload(kind, upload, json_data, url_path)
+        return json_data
+
+    async def _refresh_access_token(self, stale_token):
+        """Grants a new access token in place of a stale one.
+
+        Args:
+            stale_token: the access token to replace.
+
+        Returns:
+            the json data of the grant, or None if it was not needed.
+        """
+        async with self._get_async_token_lock():
+            if not self._is_token_stale(stale_token):
+                return None
+            return await self._grant_access_token()
+
+    async def _grant_access_token(self):
+        """Gets the access token from wechat.
+
+        Returns:
+            the json data.Example:
+            {"access_token":"ACCESS_TOKEN","expires_in":7200}
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        url = 'https://api.weixin.qq.com/cgi-bin/token'
+        json_data = await self._send_request(
+            'get', url, params=self._get_grant_params())
+        self._save_access_token(json_data)
+        return json_data
+
+    @contextlib.contextmanager
+    def override_rate_limit_timeout(self, timeout):
+        """Overrides rate_limit_timeout for the requests sent in a block.
+
+        The override is seen by the requests of the task and the tasks it
+        creates in the block:
+
+            with card_service.override_rate_limit_timeout(0):
+                await card_service.get_card(card_id)
+
+        Args:
+            timeout: the max seconds a request waits for the rate limiter,
+                see rate_limit_timeout.
+        """
+        token = self.__rate_limit_timeout.set(timeout)
+        try:
+            yield
+        finally:
+            self.__rate_limit_timeout.reset(token)
+
+    def _get_rate_limit_timeout(self):
+        """Gets the rate_limit_timeout of the request being sent."""
+        timeout = self.__rate_limit_timeout.get()
+        return self.rate_limit_timeout if timeout is self._UNSET else timeout
+
+    def _with_rate_limit_timeout(self, method, timeout):
+        """Wraps a method to call it with rate_limit_timeout overridden."""
+        async def call(*args, **kwargs):
+            with self.override_rate_limit_timeout(timeout):
+                return await method(*args, **kwargs)
+        return call
+
+    async def bulk(
+            self, method, arg_sets, workers=8, ordered=False,
+            rate_limit_timeout=Basic._UNSET):
+        """Calls a method of the service with many argument sets at once.
+
+        It is an asynchronous generator:
+
+            async for result in card_service.bulk('get_card', card_ids):
+                ...
+
+        Args:
+            method: the name of the method, or the method itself.
+            arg_sets: the iterable or asynchronous iterable of argument
+                sets, see Basic.bulk.
+            workers: the number of calls in flight.
+            ordered: whether to yield the results in the order of arg_sets.
+            rate_limit_timeout: the rate_limit_timeout of the calls, the one
+                of the service by default.
+
+        Yields:
+            the BulkResult of (args, result, error) of each argument set.
+        """
+        if not callable(method):
+            method = getattr(self, method)
+        if rate_limit_timeout is not self._UNSET:
+            method = self._with_rate_limit_timeout(method, rate_limit_timeout)
+
+        async def call(index, arg_set):
+            args, kwargs = split_args(arg_set)
+            try:
+                return index, BulkResult(
+                    arg_set, await method(*args, **kwargs), None)
+            except WechatError as e:
+                return index, BulkResult(arg_set, None, e)
+
+        arg_sets = _aiter(arg_sets)
+        window = BulkWindow(workers, ordered)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and window.has_room():
+                    try:
+                        arg_set = await arg_sets.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(
+                        call(window.submit(), arg_set)))
+                if window.is_empty():
+                    return
+                finished, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    for result in window.finish(*future.result()):
+                        yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def start_token_renewer(self, ratio=0.8, retry_interval=30):
+        """Starts to renew the access token in a background thread.
+
+        The thread renews the token by a blocking service which shares the
+        token store, so the loop never waits for the token.
+
+        Args:
+            ratio: the fraction of the token's lifetime after which it is
+                renewed.
+            retry_interval: the seconds to wait before retrying a failed
+                renewal.
+
+        Returns:
+            the renewer thread.
+        """
+        if self.__renewer_service is None:
+            self.__renewer_service = Basic(
+                self.__app_id, self.__app_secret,
+                token_store=self.token_store, metrics=self.metrics)
+        return self.__renewer_service.start_token_renewer(
+            ratio=ratio, retry_interval=retry_interval)
+
+    def stop_token_renewer(self):
+        """Stops renewing the access token in the background."""
+        if self.__renewer_service is not None:
+            self.__renewer_service.stop_token_renewer()
+
+    async def close(self):
+        """Closes the session and its connections."""
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncShakeService(ShakeService, AsyncBasic):
+
+    """The asyncio version of ShakeService."""
+
+    async def iter_devices(self, apply_id=None, count=50, workers=4):
+        """Iterates over the information of all the devices.
+
+        It is an asynchronous generator, see ShakeService.iter_devices.
+
+        Args:
+            apply_id: the applicaition number of devices.
+            count: the number of devices in a page.(no more than 50)
+            workers: the number of pages requested in parallel.
+
+        Yields:
+            the information of a device.
+        """
+        json_data = await self.search_devices(0, count, apply_id)
+        for device in json_data["data"]["devices"]:
+            yield device
+
+        arg_sets = self._get_device_page_args(json_data, count, apply_id)
+        async for result in self.bulk(
+                'search_devices', arg_sets, workers=workers, ordered=True):
+            if result.error is not None:
+                raise result.error
+            for device in result.result["data"]["devices"]:
+                yield device
+
+    async def search_devices_by_identifiers(
+            self,
+            device_ids=None, uuids=None,
+            chunk_size=50, workers=4):
+        """Finds the information of many devices.
+
+        See ShakeService.search_devices_by_identifiers.
+        """
+        arg_sets = self._chunk(
+            self._make_device_identifiers(device_ids, uuids), chunk_size)
+        results = self.bulk(
+            '_search_device_identifiers', arg_sets, workers=workers)
+        return self._index_devices([result async for result in results])
+
+    async def bind_pages_in_bulk(
+            self, bindings, bind=1, append=0, workers=8, report=None):
+        """Binds the pages of many devices in parallel.
+
+        See ShakeService.bind_pages_in_bulk.
+        """
+        report = {} if report is None else report
+        arg_sets = self._get_binding_args(bindings, bind, append, report)
+        async for result in self.bulk('bind_page', arg_sets, workers=workers):
+            report[self._get_binding_identifier(result.args)] = result.error
+        return report
+
+    async def search_pages_in_chunks(
+            self, page_ids, chunk_size=50, workers=4):
+        """Finds many pages by ids in chunks.
+
+        See ShakeService.search_pages_in_chunks.
+        """
+        results = self.bulk(
+            'search_page_by_ids', self._chunk(list(page_ids), chunk_size),
+            workers=workers)
+        return self._merge_page_chunks([result async for result in results])
+
+    async def delete_pages_in_chunks(
+            self, page_ids, chunk_size=50, workers=4):
+        """Deletes many pages by ids in chunks.
+
+        See ShakeService.delete_pages_in_chunks.
+        """
+        results = self.bulk(
+            'delete_page', self._chunk(list(page_ids), chunk_size),
+            workers=workers)
+        return self._merge_deleted_chunks(
+            [result async for result in results])
+
+    async def device_statistics_range(
+            self,
+            begin_date, end_date,
+            device_id=None, uuid=None, major=None, minor=None,
+            workers=4):
+        """Gets the statistics of a device in a date span of any length.
+
+        See ShakeService.device_statistics_range.
+        """
+        target = self._get_device_key(device_id, uuid, major, minor)
+        cached, spans = self._plan_statistics(
+            'device', target, begin_date, end_date)
+        arg_sets = [
+            (begin, end, device_id, uuid, major, minor)
+            for begin, end in self._split_statistics_spans(spans)
+        ]
+        results = self.bulk('device_statistics', arg_sets, workers=workers)
+        return self._finish_statistics(
+            'device', target, cached, spans,
+            [result async for result in results])
+
+    async def page_statistics_range(
+            self, page_id, begin_date, end_date, workers=4):
+        """Gets the statistics of a page in a date span of any length.
+
+        See ShakeService.page_statistics_range.
+        """
+        cached, spans = self._plan_statistics(
+            'page', page_id, begin_date, end_date)
+        arg_sets = [
+            (page_id, begin, end)
+            for begin, end in self._split_statistics_spans(spans)
+        ]
+        results = self.bulk('page_statistics', arg_sets, workers=workers)
+        return self._finish_statistics(
+            'page', page_id, cached, spans,
+            [result async for result in results])
+
+
+class AsyncCardService(CardService, AsyncBasic):
+
+    """The asyncio version of CardService."""
+
+    async def iter_card_ids(self, count=50):
+        """Iterates over the ids of all the cards.
+
+        It is an asynchronous generator, the next page is requested while the
+        current one is consumed.
+
+        Args:
+            count: the number of cards in a page.(no more than 50)
+
+        Yields:
+            the card id.
+        """
+        offset = 0
+        next_page = asyncio.ensure_future(self.batchget_card(offset, count))
+        try:
+            while next_page is not None:
+                json_data = await next_page
+                card_ids = json_data.get('card_id_list') or []
+                offset += len(card_ids)
+                next_page = None
+                if card_ids and offset < json_data.get('total_num', 0):
+                    next_page = asyncio.ensure_future(
+                        self.batchget_card(offset, count))
+                for card_id in card_ids:
+                    yield card_id
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+
+class AsyncDeviceRegistry(DeviceRegistry):
+
+    """The DeviceRegistry synced by an AsyncShakeService."""
+
+    async def sync(self, shake_service, apply_id=None, count=50, workers=4):
+        """Syncs the registry with all the devices of wechat.
+
+        See DeviceRegistry.sync.
+        """
+        seen = set()
+        async for device in shake_service.iter_devices(
+                apply_id=apply_id, count=count, workers=workers):
+            self.put(device)
+            seen.add(device["device_id"])
+        if apply_id is None:
+            self._remove_unseen(seen)
+
+    async def refresh(
+            self, shake_service, device_ids=None, uuids=None, workers=4):
+        """Refreshes some devices from wechat.
+
+        See DeviceRegistry.refresh.
+        """
+        devices = await shake_service.search_devices_by_identifiers(
+            device_ids=device_ids, uuids=uuids, workers=workers)
+        for key, device in devices.items():
+            if not isinstance(key, tuple):
+                self.put(device)
+
+
+class AsyncCardCatalog(CardCatalog):
+
+    """The CardCatalog synced by an AsyncCardService."""
+
+    async def sync(self, card_service, count=50, workers=4):
+        """Syncs the catalog with all the cards of wechat.
+
+        See CardCatalog.sync.
+        """
+        report = {"changed": [], "removed": [], "failures": []}
+        seen = set()
+        async for result in card_service.iter_cards(
+                count=count, workers=workers):
+            self._sync_result(result, seen, report)
+        self._finish_sync(seen, report)
+        return report
+
+
+class AsyncShakeTicketResolver(ShakeTicketResolver):
+
+    """The ShakeTicketResolver of an AsyncShakeService."""
+
+    def __init__(self, shake_service, **options):
+        """Initializes the resolver, see ShakeTicketResolver."""
+        ShakeTicketResolver.__init__(self, shake_service, **options)
+        self.__futures = {}
+
+    async def resolve(self, ticket, need_poi=None):
+        """Resolves a ticket of shaking.
+
+        See ShakeTicketResolver.resolve.
+        """
+        key = (ticket, need_poi)
+        json_data = self._get_cached(key)
+        if json_data is not None:
+            return self._enrich(json_data)
+        future = self.__futures.get(key)
+        if future is not None:
+            return self._enrich(await asyncio.shield(future))
+
+        future = asyncio.get_running_loop().create_future()
+        self.__futures[key] = future
+        try:
+            json_data = await self.shake_service.get_shake_info(
+                ticket, need_poi)
+        except BaseException as e:
+            future.set_exception(e)
+            # the error is raised here, the waiters may not retrieve it.
+            future.exception()
+            raise
+        else:
+            self._store(key, json_data)
+            future.set_result(json_data)
+        finally:
+            del self.__futures[key]
+        return self._enrich(json_data)
+
+
+class AsyncWechatService(object):
+
+    """This class is a role of factory of the asyncio services.
+
+    Attributes:
+        app_id: the app id of a wechat account.
+        app_secret: the app secret of a wechat account.
+        session: the session shared by all the services it builds.
+        token_store: the token store shared by all the services it builds.
+        options: the other options of the services it builds.
+    """
+
+    def __init__(
+            self, app_id, app_secret,
+            pool_maxsize=100, limit_per_host=0, keepalive_timeout=15,
+            token_store=None, **options):
+        """Initializes the class.
+
+        Args:
+            app_id: the app id of a wechat account.
+            app_secret: the app secret of a wechat account.
+            pool_maxsize: the max number of connections.
+            limit_per_host: the max number of connections kept for one host.
+            keepalive_timeout: the seconds to keep an idle connection alive.
+            token_store: the store of the access token.
+            options: the other options shared by the services, see Basic,
+                such as rate_limiter.
+        """
+        self.__app_id = app_id
+        self.__app_secret = app_secret
+        self.session = _LazySession({
+            "pool_maxsize": pool_maxsize,
+            "limit_per_host": limit_per_host,
+            "keepalive_timeout": keepalive_timeout
+        })
+        self.token_store = token_store or MemoryTokenStore()
+        self.options = options
+        self.__services = {}
+
+    def init_service(self, service_name):
+        """Init the asyncio service of wechat by service_name.
+
+        Args:
+            service_name: the name of wechat's service.
+
+        Returns:
+            the asyncio service of wechat
+
+        Rasies:
+            CodeBuildError
+        """
+        services = {
+            'Shake': AsyncShakeService,
+            'Card': AsyncCardService
+        }
+
+        if service_name not in services:
+            raise CodeBuildError('Service name wrong')
+        if service_name not in self.__services:
+            self.__services[service_name] = services[service_name](
+                self.__app_id, self.__app_secret,
+                session=self.session, token_store=self.token_store,
+                **self.options)
+        return self.__services[service_name]
+
+    async def close(self):
+        """Closes the shared session and its connections."""
+        await self.session.close()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""The columnar analytics of the statistics of shaking.
+
+It needs numpy (pip install pywechat[analytics]).
+
+    frame = StatisticsFrame.fetch_devices(
+        shake_service, device_ids, begin_date, end_date)
+    frame.top('shake_uv', 10)
+    frame.per_period('shake_pv', 'week')
+"""
+import numpy as np
+
+METRICS = ('click_pv', 'click_uv', 'shake_pv', 'shake_uv')
+ONE_DAY = 24 * 60 * 60
+# the ftime of wechat is the midnight of Beijing time.
+BEIJING_UTC_OFFSET = 8 * 60 * 60
+
+
+class StatisticsFrame(object):
+
+    """The statistics of many devices or pages in columnar arrays.
+
+    Every row is the statistics of a key (a device or a page) in a day, the
+    rows are kept in the arrays of numpy so the rollups are vectorized.
+
+    Attributes:
+        keys: the list of keys, a key_index is the position in it.
+        key_index: the array of the key of every row.
+        ftime: the array of the ftime of every row.
+        columns: the dict of the arrays of every metric.
+        utc_offset: the seconds of the timezone of ftime to UTC.
+    """
+
+    def __init__(
+            self, keys, key_index, ftime, columns,
+            utc_offset=BEIJING_UTC_OFFSET):
+        """Initializes the frame."""
+        self.keys = keys
+        self.key_index = key_index
+        self.ftime = ftime
+        self.columns = columns
+        self.utc_offset = utc_offset
+        self.__days = None
+
+    @classmethod
+    def from_series(cls, series_by_key, utc_offset=BEIJING_UTC_OFFSET):
+        """Builds the frame from the daily series of statistics.
+
+        Args:
+            series_by_key: the dict of key to the list of daily statistics,
+                such as the data of device_statistics or the result of
+                device_statistics_range.
+            utc_offset: the seconds of the timezone of ftime to UTC.
+
+        Returns:
+            the frame.
+        """
+        keys = list(series_by_key)
+        fields = ('ftime',) + METRICS
+        rows = [
+            [item.get(field) or 0 for field in fields]
+            for key in keys for item in series_by_key[key]
+        ]
+        table = np.array(rows, dtype=np.int64).reshape(-1, len(fields))
+        key_index = np.repeat(
+            np.arange(len(keys), dtype=np.int64),
+            [len(series_by_key[key]) for key in keys]
+        )
+        columns = dict(
+            (metric, table[:, i + 1]) for i, metric in enumerate(METRICS))
+        return cls(keys, key_index, table[:, 0], columns, utc_offset)
+
+    @classmethod
+    def fetch_devices(
+            cls, shake_service, device_ids, begin_date, end_date,
+            workers=8, utc_offset=BEIJING_UTC_OFFSET):
+        """Fetches the statistics of devices into a frame.
+
+        Args:
+            shake_service: the service of shaking.
+            device_ids: the list of device id.
+            begin_date: the timestamp of start date
+            end_date: the timestamp of end date.
+            workers: the number of devices requested in parallel.
+            utc_offset: the seconds of the timezone of ftime to UTC.
+
+        Returns:
+            the frame keyed by device id.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        arg_sets = [
+            {
+                "begin_date": begin_date,
+                "end_date": end_date,
+                "device_id": device_id,
+                "workers": 1
+            }
+            for device_id in device_ids
+        ]
+        series = {}
+        for result in shake_service.bulk(
+                'device_statistics_range', arg_sets, workers=workers):
+            if result.error is not None:
+                raise result.error
+            series[result.args["device_id"]] = result.result
+        return cls.from_series(series, utc_offset)
+
+    def __len__(self):
+        return len(self.ftime)
+
+    @property
+    def days(self):
+        '''Gets the array of the day number of every row.'''
+        if self.__days is None:
+            self.__days = (self.ftime + self.utc_offset) // ONE_DAY
+        return self.__days
+
+    def totals(self, metric):
+        """Sums a metric of every key.
+
+        Args:
+            metric: the name of metric, such as 'shake_pv'.
+
+        Returns:
+            the dict of key to the total.
+        """
+        sums = self._key_sums(metric)
+        return dict(zip(self.keys, sums.tolist()))
+
+    def rollup(self, groups, metric):
+        """Sums a metric by the groups of keys, such as poi or page.
+
+        Args:
+            groups: the dict of key to its group or the list of its groups,
+                e.g. {device_id: poi_id} or {device_id: [page_id, ...]}.
+                A key in several groups counts in each of them.
+            metric: the name of metric.
+
+        Returns:
+            the dict of group to the total.
+        """
+        key_sums = self._key_sums(metric)
+        names = []
+        name_index = {}
+        member_keys = []
+        member_groups = []
+        for i, key in enumerate(self.keys):
+            key_groups = groups.get(key)
+            if key_groups is None:
+                continue
+            if not isinstance(key_groups, (list, tuple, set)):
+                key_groups = [key_groups]
+            for group in key_groups:
+                if group not in name_index:
+                    name_index[group] = len(names)
+                    names.append(group)
+                member_keys.append(i)
+                member_groups.append(name_index[group])
+        sums = np.bincount(
+            np.array(member_groups, dtype=np.int64),
+            weights=key_sums[np.array(member_keys, dtype=np.int64)],
+            minlength=len(names)
+        )
+        return dict(zip(names, sums.astype(np.int64).tolist()))
+
+    def per_period(self, metric, period='day'):
+        """Sums a metric of all the keys by day, week or month.
+
+        Args:
+            metric: the name of metric.
+            period: 'day', 'week'(from Monday) or 'month'.
+
+        Returns:
+            the list of (the ftime of the first day of period, total) in
+            order of time.
+        """
+        if period == 'day':
+            starts = self.days
+        elif period == 'week':
+            # 1970-01-01 is a Thursday, 3 days after a Monday.
+            starts = (self.days + 3) // 7 * 7 - 3
+        elif period == 'month':
+            starts = self.days.astype('datetime64[D]').astype(
+                'datetime64[M]').astype('datetime64[D]').astype(np.int64)
+        else:
+            raise ValueError('Unknown period: {0}'.format(period))
+        periods, index = np.unique(starts, return_inverse=True)
+        sums = np.bincount(
+            index, weights=self.columns[metric], minlength=len(periods))
+        ftimes = periods * ONE_DAY - self.utc_offset
+        return list(zip(ftimes.tolist(), sums.astype(np.int64).tolist()))
+
+    def top(self, metric, n=10):
+        """Finds the keys with the largest totals of a metric.
+
+        Args:
+            metric: the name of metric.
+            n: the number of keys.
+
+        Returns:
+            the list of (key, total) in descending order of total.
+        """
+        sums = self._key_sums(metric)
+        order = np.argsort(-sums, kind='stable')[:n]
+        return [(self.keys[i], int(sums[i])) for i in order]
+
+    def day_over_day(self, metric, key=None):
+        """Gets the changes of a metric from the day before.
+
+        Args:
+            metric: the name of metric.
+            key: the key to compare, all the keys are summed if it is None.
+
+        Returns:
+            the list of (ftime, change) from the second day on.
+        """
+        rows = slice(None)
+        if key is not None:
+            rows = self.key_index == self.keys.index(key)
+        days = self.days[rows]
+        if not len(days):
+            return []
+        first = days.min()
+        sums = np.bincount(
+            days - first, weights=self.columns[metric][rows])
+        changes = np.diff(sums.astype(np.int64))
+        ftimes = (np.arange(1, len(sums)) + first) * ONE_DAY - self.utc_offset
+        return list(zip(ftimes.tolist(), changes.tolist()))
+
+    def _key_sums(self, metric):
+        """Sums a metric of every key into an array."""
+        return np.bincount(
+            self.key_index,
+            weights=self.columns[metric],
+            minlength=len(self.keys)
+        ).astype(np.int64)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import namedtuple
+
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue
+
+from pywechat.excepts import WechatError
+
+_STOP = object()
+
+
+class BulkResult(namedtuple('BulkResult', ['args', 'result', 'error'])):
+
+    """The result of one call in a bulk.
+
+    Attributes:
+        args: the argument set of the call.
+        result: the json data returned by the call, None if it failed.
+        error: the error raised by the call, None if it succeeded.
+    """
+
+    __slots__ = ()
+
+
+def split_args(arg_set):
+    """Splits an argument set into the positional and keyword arguments.
+
+    A tuple is taken as the positional arguments, a dict as the keyword
+    arguments, and anything else (a list of page ids for example) as the
+    only positional argument.
+
+    Args:
+        arg_set: the argument set of a call.
+
+    Returns:
+        a tuple of (args, kwargs).
+    """
+    if isinstance(arg_set, tuple):
+        return arg_set, {}
+    if isinstance(arg_set, dict):
+        return (), arg_set
+    return (arg_set,), {}
+
+
+def prefetch(iterable, size=1):
+    """Reads an iterable ahead in a thread while the items are consumed.
+
+    Args:
+        iterable: the iterable to read, such as a generator of pages.
+        size: the max number of items read ahead.
+
+    Yields:
+        the items of the iterable.
+    """
+    items = Queue(size)
+    stopped = threading.Event()
+
+    def read():
+        try:
+            for item in iterable:
+                items.put((item, None))
+                if stopped.is_set():
+                    return
+        except Exception as e:
+            items.put((_STOP, e))
+            return
+        items.put((_STOP, None))
+
+    thread = threading.Thread(target=read)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _STOP:
+                return
+            yield item
+    finally:
+        stopped.set()
+        # unblocks the reader if it waits for the room of the queue.
+        while thread.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except Empty:
+                pass
+
+
+class BulkWindow(object):
+
+    """The bookkeeping of the calls of a bulk.
+
+    It numbers the submitted argument sets, bounds the calls which are in
+    flight or waiting to be yielded, and releases the finished results in
+    the order of submission if it is ordered.
+
+    Attributes:
+        size: the max number of calls in flight or waiting to be yielded.
+        ordered: whether to release the results in the order of submission.
+        submitted: the number of argument sets submitted.
+        yielded: the number of results released.
+    """
+
+    def __init__(self, size, ordered=False):
+        """Initializes the window."""
+        self.size = size
+        self.ordered = ordered
+        self.submitted = 0
+        self.yielded = 0
+        self.__done = {}
+
+    def has_room(self):
+        """Checks whether another argument set can be submitted."""
+        return self.submitted - self.yielded < self.size
+
+    def is_empty(self):
+        """Checks whether all the submitted results are released."""
+        return self.yielded == self.submitted
+
+    def submit(self):
+        """Submits an argument set.
+
+        Returns:
+            the index of the argument set.
+        """
+        index = self.submitted
+        self.submitted += 1
+        return index
+
+    def finish(self, index, result):
+        """Finishes the call of an argument set.
+
+        Args:
+            index: the index of the argument set.
+            result: the BulkResult of the call.
+
+        Returns:
+            the list of results which can be yielded now.
+        """
+        if not self.ordered:
+            self.yielded += 1
+            return [result]
+        self.__done[index] = result
+        results = []
+        while self.yielded in self.__done:
+            results.append(self.__done.pop(self.yielded))
+            self.yielded += 1
+        return results
+
+
+def bulk_call(func, arg_sets, workers=8, ordered=False, catch=(WechatError,)):
+    """Calls a function with many argument sets by a pool of threads.
+
+    The argument sets are read lazily and at most twice of workers calls are
+    in flight or waiting to be yielded, so the memory stays bounded however
+    many argument sets are given.
+
+    Args:
+        func: the function to call.
+        arg_sets: the iterable of argument sets, see split_args.
+        workers: the number of threads.
+        ordered: whether to yield the results in the order of arg_sets,
+            otherwise they are yielded as soon as they are done.
+        catch: the exceptions which are collected in the results, the other
+            exceptions stop the bulk and are raised.
+
+    Yields:
+        the BulkResult of each argument set.
+    """
+    tasks = Queue()
+    results = Queue()
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                return
+            index, arg_set = task
+            args, kwargs = split_args(arg_set)
+            try:
+                result = BulkResult(arg_set, func(*args, **kwargs), None)
+            except catch as e:
+                result = BulkResult(arg_set, None, e)
+            except Exception as e:
+                results.put((index, None, e))
+                continue
+            results.put((index, result, None))
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    window = BulkWindow(workers * 2, ordered)
+    arg_sets = iter(arg_sets)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and window.has_room():
+                try:
+                    arg_set = next(arg_sets)
+                except StopIteration:
+                    exhausted = True
+                    break
+                tasks.put((window.submit(), arg_set))
+            if window.is_empty():
+                return
+            index, result, error = results.get()
+            if error is not None:
+                raise error
+            for result in window.finish(index, result):
+                yield result
+    finally:
+        for _ in threads:
+            tasks.put(_STOP)
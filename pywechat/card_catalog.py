@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import copy
+import hashlib
+import json
+import threading
+
+from pywechat.json_file import dump_json
+
+CARD_URL = 'https://api.weixin.qq.com/card/'
+
+
+class CardCatalog(object):
+
+    """The local mirror of the definitions of cards.
+
+    It keeps the card of get_card of every card in memory, so rendering a
+    card does not request wechat. Every definition is hashed, a sync only
+    counts and saves the cards whose hash changed. It is kept up to date by
+    the responses of the service, pass its update as a response listener:
+
+        catalog = CardCatalog('cards.json')
+        service = WechatService(app_id, app_secret,
+                                response_listeners=[catalog.update])
+        card_service = service.init_service('Card')
+        catalog.sync(card_service)
+        catalog.get(card_id)
+
+    Attributes:
+        path: the path of the json file to persist the catalog, None to keep
+            it only in memory.
+    """
+
+    def __init__(self, path=None):
+        """Initializes the catalog, it loads the file of path if it exists."""
+        self.path = path
+        self.__cards = {}
+        self.__hashes = {}
+        self.__lock = threading.RLock()
+        self.__updates = {
+            CARD_URL + 'create': self._update_create,
+            CARD_URL + 'update': self._update_card,
+            CARD_URL + 'modifystock': self._update_stock,
+            CARD_URL + 'delete': self._update_delete,
+        }
+        if path is not None:
+            self.load()
+
+    def __len__(self):
+        return len(self.__cards)
+
+    def __contains__(self, card_id):
+        return card_id in self.__cards
+
+    def get(self, card_id):
+        """Gets the definition of a card.
+
+        Returns:
+            the copy of the card of get_card, or None if it is unknown.
+        """
+        with self.__lock:
+            card = self.__cards.get(card_id)
+        return copy.deepcopy(card)
+
+    def card_ids(self):
+        """Gets the list of the ids of all the cards."""
+        with self.__lock:
+            return list(self.__cards)
+
+    def put(self, card_id, card):
+        """Adds or replaces the definition of a card.
+
+        Args:
+            card_id: the id of card.
+            card: the card of get_card.
+
+        Returns:
+            True if the card is new or its definition changed.
+        """
+        card_hash = self._hash(card)
+        with self.__lock:
+            if self.__hashes.get(card_id) == card_hash:
+                return False
+            self.__cards[card_id] = copy.deepcopy(card)
+            self.__hashes[card_id] = card_hash
+            return True
+
+    def remove(self, card_id):
+        """Removes a card.
+
+        Returns:
+            True if the card was in the catalog.
+        """
+        with self.__lock:
+            self.__hashes.pop(card_id, None)
+            return self.__cards.pop(card_id, None) is not None
+
+    def sync(self, card_service, count=50, workers=4):
+        """Syncs the catalog with all the cards of wechat.
+
+        The cards are updated in place as they come, a card which failed to
+        be fetched keeps its old definition. When all the cards are synced,
+        the cards which are gone are removed and the file is saved if the
+        catalog changed.
+
+        Args:
+            card_service: the service of card.
+            count: the number of cards in a page of batchget_card.
+            workers: the number of get_card calls in flight.
+
+        Returns:
+            the report of the sync. Example:
+            {
+                "changed": ["pFS7Fjg8kV1IdDz01r4SQwMkuCKc"],
+                "removed": [],
+                "failures": [("ph_gmt7cUVrlRk8swPwx7aDyF-pg", WechatError)]
+            }
+
+        Raises:
+            WechatError: to raise the exception if it fails to list the cards.
+        """
+        report = {"changed": [], "removed": [], "failures": []}
+        seen = set()
+        for result in card_service.iter_cards(count=count, workers=workers):
+            self._sync_result(result, seen, report)
+        self._finish_sync(seen, report)
+        return report
+
+    def update(self, url, data, json_data):
+        """Applies the response of a request of the service to the catalog.
+
+        It is the response listener of the service, the responses of the
+        other urls are ignored.
+
+        Args:
+            url: the url of the request.
+            data: the data of the request.
+            json_data: the json data of the response.
+        """
+        handle = self.__updates.get(url)
+        if handle is None:
+            return
+        with self.__lock:
+            if handle(data or {}, json_data) and self.path is not None:
+                self.save()
+
+    def load(self):
+        """Loads the catalog from the file of path if it exists."""
+        try:
+            with open(self.path) as catalog_file:
+                cards = json.load(catalog_file)
+        except (IOError, ValueError):
+            return
+        with self.__lock:
+            self.__cards = {}
+            self.__hashes = {}
+            for card_id, card in cards.items():
+                self.put(card_id, card)
+
+    def save(self):
+        """Saves the catalog to the file of path."""
+        with self.__lock:
+            dump_json(self.__cards, self.path)
+
+    def _sync_result(self, result, seen, report):
+        """Applies a BulkResult of get_card to the catalog and the report."""
+        seen.add(result.args)
+        if result.error is not None:
+            report["failures"].append((result.args, result.error))
+        elif self.put(result.args, result.result["card"]):
+            report["changed"].append(result.args)
+
+    def _finish_sync(self, seen, report):
+        """Removes the cards which were not seen and saves the catalog."""
+        for card_id in self.card_ids():
+            if card_id not in seen and self.remove(card_id):
+                report["removed"].append(card_id)
+        if self.path is not None and (report["changed"] or report["removed"]):
+            self.save()
+
+    def _update_create(self, data, json_data):
+        """Applies create_card."""
+        card_id = json_data.get("card_id")
+        card = data.get("card")
+        if not card_id or not card:
+            return False
+        card = copy.deepcopy(card)
+        card[card["card_type"].lower()]["base_info"]["id"] = card_id
+        return self.put(card_id, card)
+
+    def _update_card(self, data, json_data):
+        """Applies update_card, the fields which are None are not changed."""
+        card = self.get(data.get("card_id"))
+        if card is None:
+            return False
+        card_info = card[card["card_type"].lower()]
+        for key, value in (data.get(card["card_type"].lower()) or {}).items():
+            if key == "base_info":
+                card_info["base_info"].update(
+                    (field, field_value)
+                    for field, field_value in value.items()
+                    if field_value is not None
+                )
+            elif value is not None:
+                card_info[key] = value
+        return self.put(data["card_id"], card)
+
+    def _update_stock(self, data, json_data):
+        """Applies modify_stock."""
+        card = self.get(data.get("card_id"))
+        if card is None:
+            return False
+        sku = card[card["card_type"].lower()]["base_info"].setdefault(
+            "sku", {})
+        sku["quantity"] = sku.get("quantity", 0) + \
+            data.get("increase_stock_value", 0) - \
+            data.get("reduce_stock_value", 0)
+        return self.put(data["card_id"], card)
+
+    def _update_delete(self, data, json_data):
+        """Applies delete_card."""
+        return self.remove(data.get("card_id"))
+
+    @classmethod
+    def _hash(cls, card):
+        """Hashes the canonical json of a card."""
+        return hashlib.sha1(json.dumps(
+            card, sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')).hexdigest()
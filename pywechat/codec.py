@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from pywechat.excepts import CodeBuildError
+
+
+class JSONCodec(object):
+
+    """The codec of json in the standard library.
+
+    Every codec encodes the data to the bytes of UTF-8 and decodes the bytes
+    or the text of a response.
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        """Initializes the codec."""
+        # the encoder is built once instead of by every json.dumps.
+        self.__encoder = json.JSONEncoder()
+
+    def dumps(self, data):
+        """Encodes the data to the bytes of json."""
+        # the json is ascii since non-ascii characters are escaped.
+        return self.__encoder.encode(data).encode('ascii')
+
+    def loads(self, content):
+        """Decodes the bytes or the text of json."""
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        return json.loads(content)
+
+
+class OrjsonCodec(JSONCodec):
+
+    """The codec of orjson, it encodes to UTF-8 bytes in one pass."""
+
+    name = 'orjson'
+
+    def __init__(self):
+        """Initializes the codec."""
+        if orjson is None:
+            raise CodeBuildError('orjson is not installed')
+
+    def dumps(self, data):
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, content):
+        return orjson.loads(content)
+
+
+class UjsonCodec(JSONCodec):
+
+    """The codec of ujson."""
+
+    name = 'ujson'
+
+    def __init__(self):
+        """Initializes the codec."""
+        if ujson is None:
+            raise CodeBuildError('ujson is not installed')
+
+    def dumps(self, data):
+        return ujson.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, content):
+        return ujson.loads(content)
+
+
+CODECS = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec,
+}
+
+
+def get_codec(name='auto'):
+    """Gets a json codec by its name.
+
+    Args:
+        name: 'json', 'orjson', 'ujson', or 'auto' for the fastest one which
+            is installed.
+
+    Returns:
+        the codec.
+
+    Rasies:
+        CodeBuildError: the codec is unknown or not installed.
+    """
+    if name == 'auto':
+        if orjson is not None:
+            return OrjsonCodec()
+        if ujson is not None:
+            return UjsonCodec()
+        return JSONCodec()
+    if name not in CODECS:
+        raise CodeBuildError('JSON codec name wrong')
+    return CODECS[name]()
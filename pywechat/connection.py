@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def build_session(
+        pool_connections=10, pool_maxsize=10,
+        keep_alive=True, pool_block=False):
+    """Builds a session with a pool of keep-alive connections.
+
+    All requests of the services share the session, so the TCP and TLS
+    handshakes to the wechat server are done once per pooled connection
+    instead of once per request.
+
+    Args:
+        pool_connections: the number of host pools to cache.
+        pool_maxsize: the max number of connections kept for one host.
+        keep_alive: whether to keep the connections alive between requests.
+        pool_block: whether to wait for a free connection when the pool of
+            a host is full rather than open a throwaway one.
+
+    Returns:
+        the session of requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
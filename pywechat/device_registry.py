@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+import threading
+
+DEVICE_URL = 'https://api.weixin.qq.com/shakearound/device/'
+
+
+class DeviceRegistry(object):
+
+    """The local index of the devices of shaking.
+
+    It mirrors the devices of an account in memory and indexes them by
+    device_id, by (uuid, major, minor) and by poi_id, so a lookup is a read
+    of memory instead of a request of search_device. It is built by sync and
+    kept up to date by the responses of the service, pass its update as a
+    response listener of the service:
+
+        registry = DeviceRegistry()
+        service = WechatService(app_id, app_secret,
+                                response_listeners=[registry.update])
+        shake_service = service.init_service('Shake')
+        registry.sync(shake_service)
+        registry.find(uuid, major, minor)
+
+    The page_ids of a device are kept as a list of int.
+    """
+
+    def __init__(self):
+        """Initializes the registry."""
+        self.__devices = {}
+        self.__by_uuid = {}
+        self.__by_poi = {}
+        self.__lock = threading.RLock()
+        self.__updates = {
+            DEVICE_URL + 'search': self._update_search,
+            DEVICE_URL + 'applyid': self._update_apply,
+            DEVICE_URL + 'update': self._update_comment,
+            DEVICE_URL + 'bindlocation': self._update_location,
+            DEVICE_URL + 'bindpage': self._update_pages,
+        }
+
+    def __len__(self):
+        return len(self.__devices)
+
+    def get(self, device_id):
+        """Gets a device by its device_id.
+
+        Returns:
+            the copy of the information of device, or None if it is unknown.
+        """
+        with self.__lock:
+            return self._copy(self.__devices.get(device_id))
+
+    def find(self, uuid, major, minor):
+        """Finds a device by its uuid, major and minor.
+
+        Returns:
+            the copy of the information of device, or None if it is unknown.
+        """
+        with self.__lock:
+            device_id = self.__by_uuid.get((uuid, major, minor))
+            return self._copy(self.__devices.get(device_id))
+
+    def find_by_poi(self, poi_id):
+        """Finds the devices bound to a poi.
+
+        Returns:
+            the list of the copies of the information of devices.
+        """
+        with self.__lock:
+            return [
+                self._copy(self.__devices[device_id])
+                for device_id in sorted(self.__by_poi.get(poi_id, ()))
+            ]
+
+    def put(self, device):
+        """Adds or replaces a device.
+
+        Args:
+            device: the information of device, same as an item of devices of
+                search_devices.
+        """
+        device = dict(device)
+        device["page_ids"] = self._parse_page_ids(device.get("page_ids"))
+        with self.__lock:
+            self._remove(device["device_id"])
+            self.__devices[device["device_id"]] = device
+            self.__by_uuid[(
+                device["uuid"], device["major"], device["minor"]
+            )] = device["device_id"]
+            self.__by_poi.setdefault(
+                device.get("poi_id"), set()).add(device["device_id"])
+
+    def remove(self, device_id):
+        """Removes a device."""
+        with self.__lock:
+            self._remove(device_id)
+
+    def sync(self, shake_service, apply_id=None, count=50, workers=4):
+        """Syncs the registry with all the devices of wechat.
+
+        The devices are updated in place page by page, so the lookups keep
+        working while it syncs. When all the devices are synced, the devices
+        which are gone are removed.
+
+        Args:
+            shake_service: the service of shaking.
+            apply_id: the applicaition number to sync only its devices, the
+                other devices are not removed then.
+            count: the number of devices in a page.
+            workers: the number of pages requested in parallel.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        seen = set()
+        for device in shake_service.iter_devices(
+                apply_id=apply_id, count=count, workers=workers):
+            self.put(device)
+            seen.add(device["device_id"])
+        if apply_id is None:
+            self._remove_unseen(seen)
+
+    def refresh(self, shake_service, device_ids=None, uuids=None, workers=4):
+        """Refreshes some devices from wechat.
+
+        Args:
+            shake_service: the service of shaking.
+            device_ids: the list of device id.
+            uuids: the list of (uuid, major, minor) of devices.
+            workers: the number of chunks requested in parallel.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        devices = shake_service.search_devices_by_identifiers(
+            device_ids=device_ids, uuids=uuids, workers=workers)
+        for key, device in devices.items():
+            if not isinstance(key, tuple):
+                self.put(device)
+
+    def update(self, url, data, json_data):
+        """Applies the response of a request of the service to the registry.
+
+        It is the response listener of the service, the responses of the
+        other urls are ignored.
+
+        Args:
+            url: the url of the request.
+            data: the data of the request.
+            json_data: the json data of the response.
+        """
+        handle = self.__updates.get(url)
+        if handle is not None:
+            with self.__lock:
+                handle(data or {}, json_data.get("data") or {})
+
+    def _update_search(self, data, result):
+        """Puts the devices found by search_device(s)."""
+        for device in result.get("devices") or []:
+            self.put(device)
+
+    def _update_apply(self, data, result):
+        """Puts the devices applied by apply_devices."""
+        for identifier in result.get("device_identifiers") or []:
+            device = dict(identifier)
+            device.update({
+                "comment": data.get("comment", ""),
+                "page_ids": [],
+                "poi_id": data.get("poi_id", 0),
+                "status": 0
+            })
+            self.put(device)
+
+    def _update_comment(self, data, result):
+        """Applies update_device."""
+        device = self._find_identified(data)
+        if device is not None:
+            device["comment"] = data.get("comment")
+
+    def _update_location(self, data, result):
+        """Applies bind_location."""
+        device = self._find_identified(data)
+        if device is None:
+            return
+        device = dict(device)
+        device["poi_id"] = data.get("poi_id")
+        self.put(device)
+
+    def _update_pages(self, data, result):
+        """Applies bind_page, to bind, append or dismiss the pages."""
+        device = self._find_identified(data)
+        if device is None:
+            return
+        page_ids = self._parse_page_ids(data.get("page_ids"))
+        if not data.get("bind"):
+            device["page_ids"] = [
+                page_id for page_id in device["page_ids"]
+                if page_id not in page_ids
+            ]
+        elif data.get("append"):
+            device["page_ids"] = device["page_ids"] + [
+                page_id for page_id in page_ids
+                if page_id not in device["page_ids"]
+            ]
+        else:
+            device["page_ids"] = page_ids
+
+    def _find_identified(self, data):
+        """Finds the stored device by the device_identifier of a request."""
+        identifier = data.get("device_identifier") or {}
+        device_id = identifier.get("device_id")
+        if not device_id:
+            device_id = self.__by_uuid.get((
+                identifier.get("uuid"),
+                identifier.get("major"),
+                identifier.get("minor")
+            ))
+        return self.__devices.get(device_id)
+
+    def _remove(self, device_id):
+        """Removes a device and its indexes, the lock must be held."""
+        device = self.__devices.pop(device_id, None)
+        if device is None:
+            return
+        self.__by_uuid.pop(
+            (device["uuid"], device["major"], device["minor"]), None)
+        poi_devices = self.__by_poi.get(device.get("poi_id"))
+        if poi_devices is not None:
+            poi_devices.discard(device_id)
+            if not poi_devices:
+                del self.__by_poi[device.get("poi_id")]
+
+    def _remove_unseen(self, seen):
+        """Removes the devices which were not seen by a full sync."""
+        with self.__lock:
+            for device_id in list(self.__devices):
+                if device_id not in seen:
+                    self._remove(device_id)
+
+    @classmethod
+    def _parse_page_ids(cls, page_ids):
+        """Parses the page_ids of wechat, such as "15369,15370", to a list."""
+        if not page_ids:
+            return []
+        if isinstance(page_ids, (list, tuple)):
+            return [int(page_id) for page_id in page_ids]
+        return [
+            int(page_id) for page_id in str(page_ids).split(',')
+            if page_id.strip()
+        ]
+
+    @classmethod
+    def _copy(cls, device):
+        """Copies a device so the caller can not change the registry."""
+        if device is None:
+            return None
+        device = dict(device)
+        device["page_ids"] = list(device["page_ids"])
+        return device
@@ -24,3 +24,23 @@ class CodeBuildError(Exception):
 
     def __str__(self):
         return '{0}'.format(self.message)
+
+
+class RateLimitError(WechatError):
+
+    '''An exception of the local rate limit of requests.'''
+
+    def __init__(self, message=None):
+        WechatError.__init__(self, 45009, message)
+
+
+class ValidationError(WechatError):
+
+    '''An exception of the data which wechat will reject, found locally.'''
+
+    def __init__(self, field, message=None):
+        WechatError.__init__(self, None, message)
+        self.field = field
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.field, self.message)
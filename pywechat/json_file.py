@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+
+def dump_json(data, path):
+    """Writes the json of the data to a file atomically.
+
+    The json is written to a temporary file which then replaces the file, so
+    a reader never sees a file which is half written. The callers in one
+    process must not write the same path at the same time.
+
+    Args:
+        data: the data to write.
+        path: the path of the file.
+    """
+    temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'w') as json_file:
+        json.dump(data, json_file)
+    os.rename(temp_path, path)
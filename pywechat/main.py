@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import threading
+
 from pywechat.services.wechat_shake import ShakeService
 from pywechat.services.wechat_card import CardService
 
+from pywechat.connection import build_session
 from pywechat.excepts import CodeBuildError
+from pywechat.token_store import MemoryTokenStore
 
 
 class WechatService(object):
@@ -12,16 +16,47 @@ class WechatService(object):
     Attributes:
         app_id: the app id of a wechat account.
         app_secret: the app secret of a wechat account.
+        session: the session shared by all the services it builds.
+        token_store: the token store shared by all the services it builds.
+        options: the other options of the services it builds.
     """
 
-    def __init__(self, app_id, app_secret):
-        """Initializes the class."""
+    def __init__(
+            self, app_id, app_secret,
+            pool_connections=10, pool_maxsize=10, keep_alive=True,
+            token_store=None, **options):
+        """Initializes the class.
+
+        Args:
+            app_id: the app id of a wechat account.
+            app_secret: the app secret of a wechat account.
+            pool_connections: the number of host pools to cache.
+            pool_maxsize: the max number of connections kept for one host.
+            keep_alive: whether to keep the connections alive.
+            token_store: the store of the access token, such as
+                FileTokenStore or SQLiteTokenStore to share the token between
+                processes. A store in memory is used if it is None.
+            options: the other options shared by the services, see Basic,
+                such as rate_limiter.
+        """
         self.__app_id = app_id
         self.__app_secret = app_secret
+        self.session = build_session(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            keep_alive=keep_alive
+        )
+        self.token_store = token_store or MemoryTokenStore()
+        self.options = options
+        self.__services = {}
+        self.__lock = threading.Lock()
 
     def init_service(self, service_name):
         """Init the service of wechat by service_name.
 
+        The service is built once and cached, the later calls with the same
+        service_name return the same instance.
+
         Args:
             service_name: the name of wechat's service.
 
@@ -29,13 +64,19 @@ class WechatService(object):
             the service of wechat
 
         Rasies:
-            SystemError
+            CodeBuildError
         """
         services = {
             'Shake': ShakeService,
             'Card': CardService
         }
 
-        if not services.has_key(service_name):
+        if service_name not in services:
             raise CodeBuildError('Service name wrong')
-        return services[service_name](self.__app_id, self.__app_secret)
+        with self.__lock:
+            if service_name not in self.__services:
+                self.__services[service_name] = services[service_name](
+                    self.__app_id, self.__app_secret,
+                    session=self.session, token_store=self.token_store,
+                    **self.options)
+            return self.__services[service_name]
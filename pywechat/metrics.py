@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+
+from pywechat.excepts import WechatError
+
+# the upper bounds in seconds of the buckets of latency.
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def get_error_code(error):
+    """Gets the code to count an error by.
+
+    Returns:
+        the errcode of a WechatError, 'http_<status>' of a http error, or
+        the name of the class of the other errors.
+    """
+    if isinstance(error, WechatError):
+        return str(error.code)
+    status = getattr(error, 'status', None)
+    response = getattr(error, 'response', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    if status is not None:
+        return 'http_{0}'.format(status)
+    return type(error).__name__
+
+
+class _UrlMetrics(object):
+
+    """The metrics of one url."""
+
+    def __init__(self, bucket_count):
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.errors = {}
+        self.latency_sum = 0.0
+        self.latency_counts = [0] * (bucket_count + 1)
+
+
+class Metrics(object):
+
+    """The metrics of the requests of the services.
+
+    It counts the calls, the errors by errcode, the retries and the latency
+    of every url, the requests rejected by the rate limiter before they were
+    sent, and the tokens granted. An observation is a few updates
+    of dicts and lists under a lock.
+
+        metrics = Metrics()
+        service = WechatService(app_id, app_secret, metrics=metrics)
+        ...
+        metrics.snapshot()
+        metrics.to_prometheus()
+
+    Attributes:
+        buckets: the sorted upper bounds in seconds of the buckets of latency.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initializes the metrics."""
+        self.buckets = tuple(sorted(buckets))
+        self.__urls = {}
+        self.__token_refreshes = 0
+        self.__lock = threading.Lock()
+
+    def observe(self, url, seconds, error=None):
+        """Records a request which was sent.
+
+        Args:
+            url: the request's url.
+            seconds: the latency of the request.
+            error: the exception raised by the request, None if it succeeded.
+        """
+        index = bisect.bisect_left(self.buckets, seconds)
+        code = None if error is None else get_error_code(error)
+        with self.__lock:
+            url_metrics = self._get_url_metrics(url)
+            url_metrics.calls += 1
+            url_metrics.latency_sum += seconds
+            url_metrics.latency_counts[index] += 1
+            if code is not None:
+                url_metrics.errors[code] = url_metrics.errors.get(code, 0) + 1
+
+    def count_retry(self, url):
+        """Counts a request which is sent again."""
+        with self.__lock:
+            self._get_url_metrics(url).retries += 1
+
+    def count_rate_limited(self, url):
+        """Counts a request which is rejected by the rate limiter."""
+        with self.__lock:
+            self._get_url_metrics(url).rate_limited += 1
+
+    def count_token_refresh(self):
+        """Counts an access token which was granted."""
+        with self.__lock:
+            self.__token_refreshes += 1
+
+    def reset(self):
+        """Clears all the metrics."""
+        with self.__lock:
+            self.__urls = {}
+            self.__token_refreshes = 0
+
+    def snapshot(self):
+        """Gets the metrics at the moment.
+
+        Returns:
+            the dict of the metrics. Example:
+            {
+                "token_refreshes": 1,
+                "urls": {
+                    "https://api.weixin.qq.com/card/get": {
+                        "calls": 3,
+                        "retries": 1,
+                        "rate_limited": 0,
+                        "errors": {"-1": 1},
+                        "latency": {
+                            "count": 3,
+                            "sum": 0.42,
+                            "buckets": [(0.01, 0), ..., (10, 3)]
+                        }
+                    }
+                }
+            }
+            The counts of buckets are cumulative, as in prometheus.
+        """
+        with self.__lock:
+            urls = {}
+            for url, url_metrics in self.__urls.items():
+                counts = []
+                total = 0
+                for bound, count in zip(
+                        self.buckets, url_metrics.latency_counts):
+                    total += count
+                    counts.append((bound, total))
+                urls[url] = {
+                    "calls": url_metrics.calls,
+                    "retries": url_metrics.retries,
+                    "rate_limited": url_metrics.rate_limited,
+                    "errors": dict(url_metrics.errors),
+                    "latency": {
+                        "count": url_metrics.calls,
+                        "sum": url_metrics.latency_sum,
+                        "buckets": counts
+                    }
+                }
+            return {
+                "token_refreshes": self.__token_refreshes,
+                "urls": urls
+            }
+
+    def to_prometheus(self, prefix='pywechat'):
+        """Exports the metrics in the text format of prometheus.
+
+        Args:
+            prefix: the prefix of the names of metrics.
+
+        Returns:
+            the text of the metrics.
+        """
+        snapshot = self.snapshot()
+        urls = sorted(snapshot["urls"].items())
+        lines = []
+
+        def add(name, kind, help_text, samples):
+            name = '{0}_{1}'.format(prefix, name)
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} {1}'.format(name, kind))
+            for suffix, labels, value in samples:
+                lines.append('{0}{1}{2} {3}'.format(
+                    name, suffix, self._format_labels(labels), value))
+
+        add('requests_total', 'counter', 'The requests sent to wechat.', [
+            ('', [('url', url)], metrics["calls"]) for url, metrics in urls
+        ])
+        add('request_errors_total', 'counter',
+            'The failed requests by errcode.', [
+                ('', [('url', url), ('errcode', code)], count)
+                for url, metrics in urls
+                for code, count in sorted(metrics["errors"].items())
+            ])
+        add('request_retries_total', 'counter',
+            'The requests sent again.', [
+                ('', [('url', url)], metrics["retries"])
+                for url, metrics in urls
+            ])
+        add('rate_limited_total', 'counter',
+            'The requests rejected by the rate limiter before they were '
+            'sent.', [
+                ('', [('url', url)], metrics["rate_limited"])
+                for url, metrics in urls
+            ])
+        samples = []
+        for url, metrics in urls:
+            latency = metrics["latency"]
+            for bound, count in latency["buckets"]:
+                samples.append(
+                    ('_bucket', [('url', url), ('le', str(bound))], count))
+            samples.append(
+                ('_bucket', [('url', url), ('le', '+Inf')], latency["count"]))
+            samples.append(('_sum', [('url', url)], repr(latency["sum"])))
+            samples.append(('_count', [('url', url)], latency["count"]))
+        add('request_duration_seconds', 'histogram',
+            'The latency of the requests.', samples)
+        add('token_refreshes_total', 'counter',
+            'The access tokens granted.',
+            [('', [], snapshot["token_refreshes"])])
+        return '\n'.join(lines) + '\n'
+
+    def _get_url_metrics(self, url):
+        """Gets the metrics of a url, the lock must be held."""
+        url_metrics = self.__urls.get(url)
+        if url_metrics is None:
+            url_metrics = self.__urls[url] = _UrlMetrics(len(self.buckets))
+        return url_metrics
+
+    @classmethod
+    def _format_labels(cls, labels):
+        """Formats the labels of a sample of prometheus."""
+        if not labels:
+            return ''
+        return '{' + ','.join(
+            '{0}="{1}"'.format(name, value.replace('\\', '\\\\').replace(
+                '"', '\\"').replace('\n', '\\n'))
+            for name, value in labels
+        ) + '}'
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from pywechat.excepts import RateLimitError
+
+
+class TokenBucket(object):
+
+    """A bucket of tokens which fills at a steady rate.
+
+    Attributes:
+        rate: the number of tokens filled per second.
+        capacity: the max number of tokens, it is the size of a burst. It is
+            the rate by default and at least 1, so a rate below one a second,
+            such as a daily quota, still lets the requests through.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Initializes the bucket, it is full at first."""
+        self.rate = float(rate)
+        self.capacity = float(max(capacity or rate, 1))
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+
+    def fill(self, now):
+        """Fills the tokens since the last time."""
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def get_wait(self):
+        """Gets the seconds to wait for a token."""
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter(object):
+
+    """The token-bucket rate limiter of the requests per url and per app.
+
+    Every request takes a token from the bucket of its app and the bucket of
+    its url in the app, so the throughput stays under the frequency limits
+    of wechat.
+
+    Example:
+        RateLimiter(
+            per_app=(100, 200),
+            per_url={
+                'https://api.weixin.qq.com/shakearound/device/search': (10,)
+            })
+
+    Attributes:
+        per_app: the (rate, capacity) of the bucket of every app, None for no
+            limit.
+        per_url: the dict of url to the (rate, capacity) of its bucket.
+        default: the (rate, capacity) of the bucket of the other urls, None
+            for no limit.
+    """
+
+    def __init__(self, per_app=None, per_url=None, default=None):
+        """Initializes the limiter."""
+        self.per_app = per_app
+        self.per_url = per_url or {}
+        self.default = default
+        self.__buckets = {}
+        self.__lock = threading.Lock()
+
+    def _get_buckets(self, app_id, url):
+        buckets = []
+        specs = [(app_id, self.per_app),
+                 ((app_id, url), self.per_url.get(url, self.default))]
+        for key, spec in specs:
+            if spec is None:
+                continue
+            if key not in self.__buckets:
+                self.__buckets[key] = TokenBucket(*spec)
+            buckets.append(self.__buckets[key])
+        return buckets
+
+    def try_acquire(self, app_id, url):
+        """Tries to take the tokens of a request.
+
+        Args:
+            app_id: the app id of the request.
+            url: the url of the request.
+
+        Returns:
+            0 if the tokens are taken, otherwise the seconds to wait before
+            trying again.
+        """
+        with self.__lock:
+            buckets = self._get_buckets(app_id, url)
+            now = time.time()
+            wait = 0
+            for bucket in buckets:
+                bucket.fill(now)
+                wait = max(wait, bucket.get_wait())
+            if wait:
+                return wait
+            for bucket in buckets:
+                bucket.tokens -= 1
+            return 0
+
+    def acquire(self, app_id, url, timeout=None):
+        """Takes the tokens of a request, waits for them if it needs.
+
+        Args:
+            app_id: the app id of the request.
+            url: the url of the request.
+            timeout: the max seconds to wait, None to wait until the tokens
+                are taken, 0 to fail at once.
+
+        Raises:
+            RateLimitError: the tokens can not be taken in the timeout.
+        """
+        deadline = self._get_deadline(timeout)
+        while True:
+            wait = self._try_acquire_by(app_id, url, deadline)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def acquire_async(self, app_id, url, timeout=None):
+        """Takes the tokens of a request in the running loop of asyncio.
+
+        It waits for the tokens like acquire, by the timers of the loop
+        instead of blocking it:
+
+            await rate_limiter.acquire_async(app_id, url)
+
+        Args:
+            app_id: the app id of the request.
+            url: the url of the request.
+            timeout: the max seconds to wait, see acquire.
+
+        Returns:
+            the future which is done when the tokens are taken, its exception
+            is a RateLimitError if they can not be taken in the timeout.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        deadline = self._get_deadline(timeout)
+
+        def attempt():
+            if future.done():
+                return
+            try:
+                wait = self._try_acquire_by(app_id, url, deadline)
+            except RateLimitError as e:
+                future.set_exception(e)
+                return
+            if wait:
+                loop.call_later(wait, attempt)
+            else:
+                future.set_result(None)
+
+        attempt()
+        return future
+
+    @classmethod
+    def _get_deadline(cls, timeout):
+        """Gets the time to give up waiting, None to wait forever."""
+        return None if timeout is None else time.time() + timeout
+
+    def _try_acquire_by(self, app_id, url, deadline):
+        """Tries to take the tokens of a request before the deadline.
+
+        Returns:
+            0 if the tokens are taken, otherwise the seconds to wait before
+            trying again.
+
+        Raises:
+            RateLimitError: the tokens can not be taken before the deadline.
+        """
+        wait = self.try_acquire(app_id, url)
+        if wait and deadline is not None and time.time() + wait > deadline:
+            raise RateLimitError('Rate limit of {0}'.format(url))
+        return wait
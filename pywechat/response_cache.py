@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# the seconds to cache the responses of the read-mostly urls.
+DEFAULT_TTLS = {
+    'https://api.weixin.qq.com/card/getcolors': 24 * 60 * 60,
+    'https://api.weixin.qq.com/card/get': 5 * 60,
+    'https://api.weixin.qq.com/shakearound/page/search': 5 * 60,
+    'https://api.weixin.qq.com/cgi-bin/getcallbackip': 60 * 60,
+}
+
+# the cached urls whose responses are changed by a request of the url, with
+# the fields of the data to match, None to invalidate all the responses.
+DEFAULT_INVALIDATIONS = {
+    'https://api.weixin.qq.com/card/update': [
+        ('https://api.weixin.qq.com/card/get', ('card_id',))
+    ],
+    'https://api.weixin.qq.com/card/modifystock': [
+        ('https://api.weixin.qq.com/card/get', ('card_id',))
+    ],
+    'https://api.weixin.qq.com/card/delete': [
+        ('https://api.weixin.qq.com/card/get', ('card_id',))
+    ],
+    'https://api.weixin.qq.com/shakearound/page/add': [
+        ('https://api.weixin.qq.com/shakearound/page/search', None)
+    ],
+    'https://api.weixin.qq.com/shakearound/page/update': [
+        ('https://api.weixin.qq.com/shakearound/page/search', None)
+    ],
+    'https://api.weixin.qq.com/shakearound/page/delete': [
+        ('https://api.weixin.qq.com/shakearound/page/search', None)
+    ],
+}
+
+
+class ResponseCache(object):
+
+    """The LRU cache of the responses of read-mostly urls.
+
+    The responses are cached by the app id, the url and the canonical json
+    of the data, so the services of many accounts can share the cache, and
+    every url has its time to live. The requests which change the data
+    invalidate the responses they affect.
+
+    Example:
+        service = WechatService(app_id, app_secret,
+                                response_cache=ResponseCache())
+
+    Attributes:
+        ttls: the dict of url to the seconds to cache its responses, the
+            other urls are not cached.
+        invalidations: the dict of url to the list of (cached url, fields)
+            whose responses are invalidated by a request of the url.
+        max_entries: the max number of responses.
+    """
+
+    def __init__(self, ttls=None, invalidations=None, max_entries=1024):
+        """Initializes the cache."""
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.invalidations = DEFAULT_INVALIDATIONS \
+            if invalidations is None else invalidations
+        self.max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @classmethod
+    def make_key(cls, app_id, url, data):
+        """Makes the key of a response by the app id, the url and the data."""
+        if not data:
+            return app_id, url, ''
+        return app_id, url, json.dumps(
+            data, sort_keys=True, separators=(',', ':'))
+
+    def get(self, app_id, url, data=None):
+        """Gets a cached response.
+
+        Args:
+            app_id: the app id of the service which sends the request.
+            url: the url of the request.
+            data: the data of the request.
+
+        Returns:
+            the copy of the json data, or None if it is not cached.
+        """
+        if url not in self.ttls:
+            return None
+        key = self.make_key(app_id, url, data)
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                return None
+            # moves it to the end as the most recently used.
+            self.__entries[key] = entry
+        return copy.deepcopy(entry[1])
+
+    def update(self, app_id, url, data, json_data):
+        """Updates the cache by the response of a request.
+
+        It caches the response if the url is cached, and invalidates the
+        responses of the same app affected by the request.
+
+        Args:
+            app_id: the app id of the service which sent the request.
+            url: the url of the request.
+            data: the data of the request.
+            json_data: the json data of the response.
+        """
+        for cached_url, fields in self.invalidations.get(url, ()):
+            if fields is None:
+                self.invalidate(app_id, cached_url)
+            else:
+                self.invalidate(app_id, cached_url, dict(
+                    (field, (data or {}).get(field)) for field in fields))
+
+        ttl = self.ttls.get(url)
+        if not ttl:
+            return
+        key = self.make_key(app_id, url, data)
+        entry = (time.time() + ttl, copy.deepcopy(json_data))
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__entries[key] = entry
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, app_id, url, data=None):
+        """Invalidates the cached responses of a url of an app.
+
+        Args:
+            app_id: the app id of the responses.
+            url: the url of the request.
+            data: the data of the request, None to invalidate all the
+                responses of the url.
+        """
+        with self.__lock:
+            if data is not None:
+                self.__entries.pop(self.make_key(app_id, url, data), None)
+                return
+            for key in list(self.__entries):
+                if key[:2] == (app_id, url):
+                    del self.__entries[key]
+
+    def clear(self):
+        """Invalidates all the cached responses."""
+        with self.__lock:
+            self.__entries.clear()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import random
+
+import requests
+
+try:
+    from requests.packages.urllib3.exceptions import NewConnectionError
+except ImportError:
+    # the urllib3 bundled by requests before 2.9 has no NewConnectionError.
+    NewConnectionError = None
+
+try:
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from pywechat.excepts import WechatError
+
+# the errcodes of an invalid or expired access token.
+TOKEN_INVALID_CODES = (40001, 40014, 42001)
+
+# the urls whose requests change something every time they are sent, a
+# request of them which may have reached wechat is never sent again.
+NON_IDEMPOTENT_URLS = frozenset([
+    'https://api.weixin.qq.com/card/create',
+    'https://api.weixin.qq.com/card/modifystock',
+    'https://api.weixin.qq.com/card/qrcode/create',
+    'https://api.weixin.qq.com/cgi-bin/media/uploadimg',
+    'https://api.weixin.qq.com/shakearound/device/applyid',
+    'https://api.weixin.qq.com/shakearound/material/add',
+    'https://api.weixin.qq.com/shakearound/page/add',
+])
+
+# the exceptions of connection to retry, and the ones raised before the
+# request is sent, aiohttp's are added if it is installed.
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+UNSENT_ERRORS = (requests.exceptions.ConnectTimeout,)
+if aiohttp is not None:
+    RETRY_ERRORS += (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+    UNSENT_ERRORS += (aiohttp.ClientConnectorError,)
+
+
+class RetryPolicy(object):
+
+    """The policy to retry the failed requests with backoff.
+
+    The delay before the n-th retry is a random time between 0 and
+    min(max_delay, base_delay * 2 ** n), the jitter keeps the clients from
+    retrying at the same time.
+
+    The errcodes of wechat are answers of the server, so they are retried
+    for every url. The other failures may happen after the request reached
+    wechat, so for the non-idempotent urls only the ones raised before the
+    request was sent are retried, a card or a page is never created twice.
+
+    Attributes:
+        max_attempts: the max number of attempts of a request.
+        base_delay: the seconds of the delay before the first retry.
+        max_delay: the max seconds of the delay.
+        retry_codes: the errcodes of wechat to retry, -1 is system busy.
+        retry_statuses: the http status codes to retry.
+        retry_errors: the exceptions of connection to retry.
+        unsent_errors: the exceptions raised before a request is sent, such
+            as the timeout of connecting.
+        non_idempotent_urls: the urls which are only retried for the
+            errcodes and the unsent errors.
+    """
+
+    def __init__(
+            self, max_attempts=3, base_delay=0.5, max_delay=10,
+            retry_codes=(-1,), retry_statuses=(500, 502, 503, 504),
+            retry_errors=RETRY_ERRORS, unsent_errors=UNSENT_ERRORS,
+            non_idempotent_urls=NON_IDEMPOTENT_URLS):
+        """Initializes the policy."""
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_codes = retry_codes
+        self.retry_statuses = retry_statuses
+        self.retry_errors = retry_errors
+        self.unsent_errors = unsent_errors
+        self.non_idempotent_urls = non_idempotent_urls
+
+    def is_retryable(self, error, url=None):
+        """Checks whether a request which raises the error can be retried.
+
+        Args:
+            error: the exception raised by the request.
+            url: the url of the request, None if it is idempotent.
+
+        Returns:
+            True if it can be retried.
+        """
+        if isinstance(error, WechatError):
+            return error.code in self.retry_codes
+        if self.is_unsent(error):
+            return True
+        if url in self.non_idempotent_urls:
+            return False
+        status = getattr(error, 'status', None)
+        response = getattr(error, 'response', None)
+        if status is None and response is not None:
+            status = getattr(response, 'status_code', None)
+        if status is not None:
+            return status in self.retry_statuses
+        return isinstance(error, self.retry_errors)
+
+    def is_unsent(self, error):
+        """Checks whether a request which raises the error was not sent.
+
+        It is true for the unsent errors and the connection errors of
+        requests which failed to connect, if its urllib3 tells them apart.
+        """
+        if isinstance(error, self.unsent_errors):
+            return True
+        if NewConnectionError is None or \
+                not isinstance(error, requests.ConnectionError) or \
+                not error.args:
+            return False
+        reason = getattr(error.args[0], 'reason', error.args[0])
+        return isinstance(reason, NewConnectionError)
+
+    def get_delay(self, attempt):
+        """Gets the seconds to wait before a retry.
+
+        Args:
+            attempt: the number of attempts which have failed, from 1.
+
+        Returns:
+            the seconds to wait.
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def is_token_invalid(error):
+    """Checks whether the error is caused by an invalid access token."""
+    return isinstance(error, WechatError) and \
+        error.code in TOKEN_INVALID_CODES
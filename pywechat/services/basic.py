@@ -1,9 +1,38 @@
 # -*- coding: utf-8 -*-
-import json
+import contextlib
+import threading
 import time
-import requests
 
-from pywechat.excepts import WechatError
+from pywechat.bulk import bulk_call
+from pywechat.codec import JSONCodec
+from pywechat.connection import build_session
+from pywechat.excepts import RateLimitError, WechatError
+from pywechat.retry import is_token_invalid
+from pywechat.token_renewer import TokenRenewer
+from pywechat.token_store import MemoryTokenStore
+from pywechat.uploads import MultipartStream, Upload
+
+
+# the max seconds to keep the access token in memory before it is read from
+# the token store again, so a token renewed by another process is used long
+# before the old one stops working.
+TOKEN_RELOAD_SECONDS = 60
+
+_default_codec = JSONCodec()
+_token_locks = {}
+_token_locks_guard = threading.Lock()
+
+
+def _get_token_lock(app_id):
+    """Gets the lock which guards the refreshing of an app's token.
+
+    All the services of one app in the process share the lock, so only one
+    of them grants the access token at a time.
+    """
+    with _token_locks_guard:
+        if app_id not in _token_locks:
+            _token_locks[app_id] = threading.Lock()
+        return _token_locks[app_id]
 
 
 class Basic(object):
@@ -15,30 +44,259 @@ class Basic(object):
         app_secret: the app secret of a wechat account.
         access_token: the access token requests from the wechat.
         token_expires_time: the time that the access token will expire.
+        session: the session of requests which pools the connections.
+        token_store: the store which keeps the access token.
+        rate_limiter: the RateLimiter which paces the requests.
+        rate_limit_timeout: the max seconds a request waits for the rate
+            limiter, None to wait as long as it needs, 0 to fail at once. It
+            can be overridden by override_rate_limit_timeout.
+        retry_policy: the RetryPolicy of the failed requests.
+        response_cache: the ResponseCache of the read-mostly urls.
+        response_listeners: the list of functions called with (url, data,
+            json data) after every succeeded request, such as the update of
+            a DeviceRegistry.
+        upload_index: the UploadIndex of the uploaded files.
+        validator: the Validator which checks the data of the requests.
+        json_codec: the codec of the json of the requests and responses,
+            None for the json of the standard library.
+        metrics: the Metrics of the requests.
+        statistics_cache: the StatisticsCache which keeps the statistics of
+            closed days for the range methods of shaking.
     """
 
-    def __init__(self, app_id, app_secret):
-        """Initializes the service."""
+    # the plan of a failed request to be sent again with a new access token.
+    _REPLAY = object()
+    # the default of the arguments which override an option when they are
+    # given, None included.
+    _UNSET = object()
+
+    def __init__(
+            self, app_id, app_secret, session=None, token_store=None,
+            rate_limiter=None, rate_limit_timeout=None, retry_policy=None,
+            response_cache=None, response_listeners=None, upload_index=None,
+            validator=None, json_codec=None, metrics=None,
+            statistics_cache=None):
+        """Initializes the service.
+
+        It does not request the wechat, the access token is granted when it is
+        needed at the first time.
+
+        Args:
+            app_id: the app id of a wechat account.
+            app_secret: the app secret of a wechat account.
+            session: the shared session of requests, a new pooled session
+                will be built if it is None.
+            token_store: the shared store of the access token, a new store
+                in memory will be used if it is None.
+            rate_limiter: the shared RateLimiter, None for no limit.
+            rate_limit_timeout: the max seconds a request waits for the rate
+                limiter, None to wait as long as it needs, 0 to fail at once.
+            retry_policy: the RetryPolicy of the failed requests, None not to
+                retry them.
+            response_cache: the shared ResponseCache, None not to cache the
+                responses.
+            response_listeners: the list of functions called with (url, data,
+                json data) after every succeeded request.
+            upload_index: the shared UploadIndex, None to upload the same
+                files every time.
+            validator: the shared Validator, None not to check the data of
+                the requests locally.
+            json_codec: the codec of json, such as get_codec('auto'), None
+                for the json of the standard library.
+            metrics: the shared Metrics, None not to record the requests.
+            statistics_cache: the shared StatisticsCache, None to request
+                every day of the statistics.
+        """
         self.__app_id = app_id
         self.__app_secret = app_secret
-        self.__access_token = self.access_token
-        self.__token_expires_at = None
+        self.session = session or build_session()
+        self.token_store = token_store or MemoryTokenStore()
+        self.rate_limiter = rate_limiter
+        self.rate_limit_timeout = rate_limit_timeout
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        self.response_listeners = list(response_listeners or [])
+        self.upload_index = upload_index
+        self.validator = validator
+        self.json_codec = json_codec
+        self.metrics = metrics
+        self.statistics_cache = statistics_cache
+        # the tuple of (access_token, expires_at, loaded_at) last loaded.
+        self.__token = (None, None, 0)
+        self.__token_lock = _get_token_lock(app_id)
+        self.__local = threading.local()
+        self.__token_renewer = None
 
     @property
     def access_token(self):
         '''Gets the access token.'''
         # check the access token
-        if self.__access_token and self.__token_expires_at:
-            if self.__token_expires_at - time.time() > 60:
-                return self.__access_token
+        access_token, expires_at = self._load_access_token()
+        if self._is_token_valid(access_token, expires_at):
+            return access_token
+
+        # if access token is invaild, grant it once, the other threads wait
+        # for the lock and then read the new token.
+        with self.__token_lock:
+            access_token, expires_at = self._load_access_token()
+            if self._is_token_valid(access_token, expires_at):
+                return access_token
+            self._grant_access_token()
+            return self._load_access_token()[0]
+
+    def start_token_renewer(self, ratio=0.8, retry_interval=30):
+        """Starts to renew the access token in the background.
+
+        Args:
+            ratio: the fraction of the token's lifetime after which it is
+                renewed.
+            retry_interval: the seconds to wait before retrying a failed
+                renewal.
+
+        Returns:
+            the renewer thread.
+        """
+        if self.__token_renewer is None or not self.__token_renewer.is_alive():
+            self.__token_renewer = TokenRenewer(
+                self, ratio=ratio, retry_interval=retry_interval)
+            self.__token_renewer.start()
+        return self.__token_renewer
+
+    def stop_token_renewer(self):
+        """Stops renewing the access token in the background."""
+        if self.__token_renewer is not None:
+            self.__token_renewer.stop()
+            self.__token_renewer = None
+
+    @contextlib.contextmanager
+    def override_rate_limit_timeout(self, timeout):
+        """Overrides rate_limit_timeout for the requests sent in a block.
+
+        The override is seen by the requests of the thread only, so a cached
+        service can fail fast for one caller and wait for another:
+
+            with card_service.override_rate_limit_timeout(0):
+                card_service.get_card(card_id)
+
+        Args:
+            timeout: the max seconds a request waits for the rate limiter,
+                see rate_limit_timeout.
+        """
+        previous = getattr(self.__local, 'rate_limit_timeout', self._UNSET)
+        self.__local.rate_limit_timeout = timeout
+        try:
+            yield
+        finally:
+            self.__local.rate_limit_timeout = previous
+
+    def _get_rate_limit_timeout(self):
+        """Gets the rate_limit_timeout of the request being sent."""
+        timeout = getattr(self.__local, 'rate_limit_timeout', self._UNSET)
+        return self.rate_limit_timeout if timeout is self._UNSET else timeout
+
+    def _with_rate_limit_timeout(self, method, timeout):
+        """Wraps a method to call it with rate_limit_timeout overridden."""
+        def call(*args, **kwargs):
+            with self.override_rate_limit_timeout(timeout):
+                return method(*args, **kwargs)
+        return call
+
+    def bulk(
+            self, method, arg_sets, workers=8, ordered=False,
+            rate_limit_timeout=_UNSET):
+        """Calls a method of the service with many argument sets at once.
+
+        The calls run on a pool of threads and share the pooled session, so
+        workers should not be more than the pool size of the session.
+
+        Example:
+            for result in card_service.bulk('get_card', card_ids):
+                if result.error is None:
+                    print(result.args, result.result)
+
+        Args:
+            method: the name of the method, or the method itself.
+            arg_sets: the iterable of argument sets. A tuple is taken as the
+                positional arguments, a dict as the keyword arguments and
+                anything else as the only argument.
+            workers: the number of calls in flight.
+            ordered: whether to yield the results in the order of arg_sets.
+            rate_limit_timeout: the rate_limit_timeout of the calls, the one
+                of the service by default.
+
+        Yields:
+            the BulkResult of (args, result, error) of each argument set,
+            the WechatError of a call is kept in its error.
+        """
+        if not callable(method):
+            method = getattr(self, method)
+        if rate_limit_timeout is not self._UNSET:
+            method = self._with_rate_limit_timeout(method, rate_limit_timeout)
+        return bulk_call(method, arg_sets, workers=workers, ordered=ordered)
+
+    def _refresh_access_token(self, stale_token):
+        """Grants a new access token in place of a stale one.
 
-        # if access token is invaild, grant it.
-        self._grant_access_token()
-        return self.__access_token
+        The stale token is kept in the store until the new one is granted. It
+        does nothing if another thread or process has replaced it already.
+
+        Args:
+            stale_token: the access token to replace.
+
+        Returns:
+            the json data of the grant, or None if it was not needed.
+        """
+        with self.__token_lock:
+            if not self._is_token_stale(stale_token):
+                return None
+            return self._grant_access_token()
+
+    def _is_token_stale(self, stale_token):
+        """Checks whether the stored access token is still the stale one.
+
+        The stale token is forgotten in memory if it is.
+        """
+        if self._load_access_token(reload=True)[0] != stale_token:
+            return False
+        self.__token = (None, None, 0)
+        return True
+
+    @classmethod
+    def _is_token_valid(cls, access_token, expires_at):
+        """Checks whether the access token can be used for a while."""
+        return bool(
+            access_token and expires_at and expires_at - time.time() > 60)
+
+    def _load_access_token(self, reload=False):
+        """Loads the access token.
+
+        The token is kept in memory, the token store is read only when the
+        token is near expiry or was loaded TOKEN_RELOAD_SECONDS ago.
+
+        Args:
+            reload: whether to read the token store anyway.
+
+        Returns:
+            a tuple of (access_token, expires_at).
+        """
+        access_token, expires_at, loaded_at = self.__token
+        now = time.time()
+        if reload or now - loaded_at >= TOKEN_RELOAD_SECONDS or \
+                not self._is_token_valid(access_token, expires_at):
+            access_token, expires_at = \
+                self.token_store.get(self.__app_id) or (None, None)
+            self.__token = (access_token, expires_at, now)
+        return access_token, expires_at
 
     def _send_request(self, method, url, **kwargs):
         """Sends a request to the server.
 
+        If the access token of the request is invalid, a new token is granted
+        and the request is sent again once. The failures allowed by the retry
+        policy are retried with backoff. The responses of the urls cached by
+        the response cache are read from it. The data is checked by the
+        validator before anything is sent.
+
         Args:
             method: the method of request.('get', 'post', etc)
             url: the request's url.
@@ -49,26 +307,283 @@ class Basic(object):
 
         Raises:
             WechatError: to raise the exception if it contains the error.
+            RateLimitError: the rate limiter does not allow the request in
+                rate_limit_timeout.
+            ValidationError: the validator rejects the data.
         """
+        data = kwargs.get('data')
+        json_data = self._prepare_request(url, kwargs)
+        if json_data is not None:
+            return json_data
+
+        access_token = None
         if not kwargs.get('params'):
-            kwargs['params'] = {
-                "access_token": self.access_token
-            }
-        if kwargs.get('data'):
-            data = json.dumps(kwargs['data']).encode('utf-8')
-            kwargs["data"] = data
+            access_token = self.access_token
+            self._set_access_token(kwargs, access_token)
+        self._encode_request(kwargs)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self._acquire_rate_limit(url)
+            started = time.time()
+            try:
+                json_data = self._send_request_once(method, url, kwargs)
+                break
+            except Exception as e:
+                delay = self._plan_retry(
+                    url, kwargs, e, attempt, started, access_token)
+                if delay is None:
+                    raise
+                if delay is self._REPLAY:
+                    # replays the request once with a new token.
+                    self._refresh_access_token(access_token)
+                    access_token = None
+                    self._set_access_token(kwargs, self.access_token)
+                else:
+                    time.sleep(delay)
+
+        self._handle_response(url, data, started, json_data)
+        return json_data
+
+    def _prepare_request(self, url, kwargs):
+        """Checks the data of a request and reads its cached response.
+
+        Args:
+            url: the request's url.
+            kwargs: the keyword arguments of the request before it is
+                encoded.
+
+        Returns:
+            the cached json data, or None if the request must be sent.
+
+        Raises:
+            ValidationError: the validator rejects the data.
+        """
+        if self.validator is not None:
+            self.validator.validate(url, kwargs)
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(
+            self.__app_id, url, kwargs.get('data'))
+
+    @classmethod
+    def _set_access_token(cls, kwargs, access_token):
+        """Sets the access token in the params of a request."""
+        kwargs['params'] = {
+            "access_token": access_token
+        }
 
-        request = requests.request(
+    def _plan_retry(self, url, kwargs, error, attempt, started, access_token):
+        """Records a failed attempt of a request and decides what to do.
+
+        Args:
+            url: the request's url.
+            kwargs: the encoded keyword arguments of the request.
+            error: the exception raised by the attempt.
+            attempt: the number of attempts which have failed.
+            started: the time when the attempt was sent.
+            access_token: the access token of the request, None if it has
+                been replayed with a new token or has its own params.
+
+        Returns:
+            _REPLAY to send the request again with a new access token, the
+            seconds to wait before sending it again, or None to raise the
+            error.
+        """
+        self._observe_request(url, started, error)
+        if access_token is not None and is_token_invalid(error):
+            delay = self._REPLAY
+        elif self._should_retry(error, attempt, url):
+            delay = self.retry_policy.get_delay(attempt)
+        else:
+            return None
+        self._count_retry(url)
+        self._rewind_files(kwargs)
+        return delay
+
+    def _send_request_once(self, method, url, kwargs):
+        """Sends a request to the server once.
+
+        Args:
+            method: the method of request.('get', 'post', etc)
+            url: the request's url.
+            kwargs: the encoded data will send to.
+
+        Returns:
+            the json data gets from the server.
+        """
+        request = self.session.request(
             method=method,
             url=url,
             **kwargs
         )
 
         request.raise_for_status()
-        json_data = request.json()
+        if self.json_codec is None:
+            json_data = request.json()
+        else:
+            json_data = self.json_codec.loads(request.content)
         self._check_wechat_error(json_data)
         return json_data
 
+    def _acquire_rate_limit(self, url):
+        """Takes the tokens of a request from the rate limiter.
+
+        A request which is rejected is counted as rate limited in the
+        metrics, it is not a request sent.
+
+        Raises:
+            RateLimitError: the rate limiter does not allow the request in
+                rate_limit_timeout.
+        """
+        if self.rate_limiter is None:
+            return
+        try:
+            self.rate_limiter.acquire(
+                self.__app_id, url, timeout=self._get_rate_limit_timeout())
+        except RateLimitError:
+            self._count_rate_limited(url)
+            raise
+
+    def _handle_response(self, url, data, started, json_data):
+        """Records a succeeded response and passes it to the cache and the
+        listeners.
+
+        Args:
+            url: the request's url.
+            data: the data of the request before it was encoded.
+            started: the time when the request was sent.
+            json_data: the json data gets from the server.
+        """
+        self._observe_request(url, started)
+        if self.response_cache is not None:
+            self.response_cache.update(self.__app_id, url, data, json_data)
+        for listener in self.response_listeners:
+            listener(url, data, json_data)
+
+    def _observe_request(self, url, started, error=None):
+        """Records a request which was sent in the metrics.
+
+        Args:
+            url: the request's url.
+            started: the time when the request was sent.
+            error: the exception raised by the request.
+        """
+        if self.metrics is not None:
+            self.metrics.observe(url, time.time() - started, error)
+
+    def _count_retry(self, url):
+        """Counts a request which is sent again in the metrics."""
+        if self.metrics is not None:
+            self.metrics.count_retry(url)
+
+    def _count_rate_limited(self, url):
+        """Counts a request rejected by the rate limiter in the metrics."""
+        if self.metrics is not None:
+            self.metrics.count_rate_limited(url)
+
+    def _should_retry(self, error, attempt, url):
+        """Checks whether to retry a request by the retry policy.
+
+        Args:
+            error: the exception raised by the request.
+            attempt: the number of attempts which have failed.
+            url: the request's url.
+        """
+        policy = self.retry_policy
+        return bool(
+            policy and attempt < policy.max_attempts and
+            policy.is_retryable(error, url))
+
+    @classmethod
+    def _rewind_files(cls, kwargs):
+        """Rewinds the files of a request to send them again."""
+        streams = list((kwargs.get('files') or {}).values())
+        streams.append(kwargs.get('data'))
+        for value in streams:
+            if hasattr(value, 'seek'):
+                value.seek(0)
+
+    def _encode_request(self, kwargs):
+        """Encodes the data of a request to json in place.
+
+        The data is encoded to the bytes of UTF-8 by the json codec. The data
+        which is not a dict or a list, such as a stream, is sent as it is.
+
+        Args:
+            kwargs: the keyword arguments of the request.
+        """
+        data = kwargs.get('data')
+        if data and isinstance(data, (dict, list)):
+            kwargs["data"] = (self.json_codec or _default_codec).dumps(data)
+
+    def _upload_once(self, url, name, source, filename, kind, url_path):
+        """Uploads a file unless the same content was uploaded.
+
+        The file is hashed first, the url of the same content is read from
+        the upload index, otherwise the file is streamed in a multipart form
+        and the returned url is saved to the index.
+
+        Args:
+            url: the request's url.
+            name: the name of the field of the file.
+            source: the path of the file, or a file object opened in binary.
+            filename: the name of the file, the name of source by default.
+            kind: the kind of upload in the index.
+            url_path: the keys of the returned url in the json data.
+
+        Returns:
+            the json data of the upload, or the same data made from the
+            index.
+        """
+        with Upload(source, filename) as upload:
+            json_data = self._find_upload(kind, upload, url_path)
+            if json_data is None:
+                json_data = self._send_upload(url, name, upload)
+                self._save_upload(kind, upload, json_data, url_path)
+        return json_data
+
+    def _send_upload(self, url, name, upload):
+        """Sends an Upload in a streamed multipart form."""
+        stream = MultipartStream(name, upload)
+        headers = {
+            "Content-Type": stream.content_type,
+            "Content-Length": str(stream.len)
+        }
+        return self._send_request('post', url, data=stream, headers=headers)
+
+    def _find_upload(self, kind, upload, url_path):
+        """Finds the content of an Upload in the index.
+
+        Returns:
+            the json data made from the uploaded url, or None if the content
+            was not uploaded.
+        """
+        if self.upload_index is None:
+            return None
+        uploaded_url = self.upload_index.get(kind, upload.digest)
+        if uploaded_url is None:
+            return None
+        return self._make_upload_json(url_path, uploaded_url)
+
+    def _save_upload(self, kind, upload, json_data, url_path):
+        """Saves the returned url of an Upload to the index."""
+        if self.upload_index is None:
+            return
+        for key in url_path:
+            json_data = (json_data or {}).get(key)
+        if json_data:
+            self.upload_index.set(kind, upload.digest, json_data)
+
+    @classmethod
+    def _make_upload_json(cls, url_path, uploaded_url):
+        """Makes the json data of an upload from its url."""
+        json_data = uploaded_url
+        for key in reversed(url_path):
+            json_data = {key: json_data}
+        return json_data
+
     @classmethod
     def _check_wechat_error(cls, json_data):
         """Check whether the data from the plaform of wechat is an error.
@@ -100,18 +615,32 @@ class Basic(object):
             WechatError: to raise the exception if it contains the error.
         """
 
-        # Checks whether the access token is in memcache,
         url = 'https://api.weixin.qq.com/cgi-bin/token'
-        params = {
+        json_data = self._send_request(
+            'get', url, params=self._get_grant_params())
+        self._save_access_token(json_data)
+        return json_data
+
+    def _get_grant_params(self):
+        """Gets the params to grant the access token."""
+        return {
             "grant_type": "client_credential",
             "appid": self.__app_id,
             "secret": self.__app_secret
         }
-        json_data = self._send_request('get', url, params=params)
-        self.__access_token = json_data.get('access_token')
-        self.__token_expires_at = int(
-            time.time()) + json_data.get('expires_in')
-        return json_data
+
+    def _save_access_token(self, json_data):
+        """Saves the granted access token to the token store.
+
+        Args:
+            json_data: the json data of granting the access token.
+        """
+        access_token = json_data.get('access_token')
+        expires_at = int(time.time()) + json_data.get('expires_in')
+        self.token_store.set(self.__app_id, access_token, expires_at)
+        self.__token = (access_token, expires_at, time.time())
+        if self.metrics is not None:
+            self.metrics.count_token_refresh()
 
     def _get_wechat_server_ips(self):
         """Gets the ip list from wechat.
@@ -132,8 +661,5 @@ class Basic(object):
             WechatError: to raise the exception if it contains the error.
         """
         url = "https://api.weixin.qq.com/cgi-bin/getcallbackip"
-        params = {
-            "access_token": self.access_token
-        }
-        json_data = self._send_request('get', url, params=params)
+        json_data = self._send_request('get', url)
         return json_data
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from pywechat.bulk import prefetch
 from pywechat.services.basic import Basic
 
 
@@ -33,6 +34,29 @@ class CardService(Basic):
         json_data = self._send_request('post', url, files=files)
         return json_data
 
+    def upload_image_once(self, source, filename=None):
+        """Uploads the image for the logo of card once by its content.
+
+        The file is streamed without loading it into memory. When the service
+        has an upload index, the same bytes uploaded before return the saved
+        url without a request.
+
+        Args:
+            source: the path of the image, or a file object opened in binary.
+            filename: the name of the image, the name of source by default.
+
+        Returns:
+            the json data, same as upload_image.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+
+        url = 'https://api.weixin.qq.com/cgi-bin/media/uploadimg'
+        json_data = self._upload_once(
+            url, 'buffer', source, filename, 'card_image', ("url",))
+        return json_data
+
     def get_colors(self):
         """Gets the available colors of cards.
 
@@ -361,6 +385,56 @@ class CardService(Basic):
         json_data = self._send_request('post', url, data=data)
         return json_data
 
+    def iter_card_ids(self, count=50):
+        """Iterates over the ids of all the cards.
+
+        It walks the pages of batchget_card and fetches the next page while
+        the current one is consumed, only one page is kept in memory.
+
+        Args:
+            count: the number of cards in a page.(no more than 50)
+
+        Yields:
+            the card id.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        for card_ids in prefetch(self._iter_card_id_pages(count)):
+            for card_id in card_ids:
+                yield card_id
+
+    def iter_cards(self, count=50, workers=4):
+        """Iterates over the details of all the cards.
+
+        The ids from iter_card_ids are passed to get_card by the bulk
+        executor as they come.
+
+        Args:
+            count: the number of cards in a page.(no more than 50)
+            workers: the number of get_card calls in flight.
+
+        Yields:
+            the BulkResult of (card_id, json data of get_card, error).
+
+        Raises:
+            WechatError: to raise the exception if it fails to list the cards.
+        """
+        return self.bulk(
+            'get_card', self.iter_card_ids(count),
+            workers=workers, ordered=True)
+
+    def _iter_card_id_pages(self, count):
+        """Iterates over the pages of card ids."""
+        offset = 0
+        while True:
+            json_data = self.batchget_card(offset, count)
+            card_ids = json_data.get('card_id_list') or []
+            yield card_ids
+            offset += len(card_ids)
+            if not card_ids or offset >= json_data.get('total_num', 0):
+                return
+
     def update_card(
             self, card_id, card_type,
             logo_url, notice, description, color, detail=None,
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from pywechat.services.basic import Basic
 
+ONE_DAY = 24 * 60 * 60
+# the max time span of a request of statistics is 30 days.
+STATISTICS_MAX_DAYS = 30
+
 
 class ShakeService(Basic):
 
@@ -8,7 +12,6 @@ class ShakeService(Basic):
 
     All request's urls come from the official documents.
     Link: https://mp.weixin.qq.com/wiki/home/index.html
-
     """
 
     def bind_page(
@@ -67,6 +70,65 @@ class ShakeService(Basic):
         json_data = self._send_request('post', url, data=data)
         return json_data
 
+    def bind_pages_in_bulk(
+            self, bindings, bind=1, append=0, workers=8, report=None):
+        """Binds the pages of many devices in parallel.
+
+        The binds are sent through the rate limiter of the service. The
+        report is updated as soon as a device is done, so a bulk stopped by
+        an error can be resumed by passing its report back.
+
+        Args:
+            bindings: the dict of the identifier of device, a device_id or
+                a tuple of (uuid, major, minor), to the list of page_id.
+            bind: the mark of binding operation, same as bind_page.
+            append: the mark of appending operation, same as bind_page.
+            workers: the number of devices bound in parallel.
+            report: the report of a former bulk, the devices which were
+                bound in it are skipped.
+
+        Returns:
+            the report, the dict of the identifier of device to the error of
+            binding, None if it was bound. Example:
+            {
+                10011: None,
+                ("FDA50693-A4E2-4FB1-AFCF-C6EB07647825", 1002, 1223): None,
+                10012: WechatError
+            }
+        """
+        report = {} if report is None else report
+        arg_sets = self._get_binding_args(bindings, bind, append, report)
+        for result in self.bulk('bind_page', arg_sets, workers=workers):
+            report[self._get_binding_identifier(result.args)] = result.error
+        return report
+
+    @classmethod
+    def _get_binding_args(cls, bindings, bind, append, report):
+        """Makes the argument sets of bind_page for the unbound devices."""
+        arg_sets = []
+        for identifier, page_ids in bindings.items():
+            if identifier in report and report[identifier] is None:
+                continue
+            arg_set = {
+                "page_ids": page_ids,
+                "bind": bind,
+                "append": append
+            }
+            if isinstance(identifier, tuple):
+                arg_set["uuid"], arg_set["major"], arg_set["minor"] = \
+                    identifier
+            else:
+                arg_set["device_id"] = identifier
+            arg_sets.append(arg_set)
+        return arg_sets
+
+    @classmethod
+    def _get_binding_identifier(cls, arg_set):
+        """Gets the identifier of device from an argument set of bind_page."""
+        if "device_id" in arg_set:
+            return arg_set["device_id"]
+        return arg_set["uuid"], arg_set["major"], arg_set["minor"]
+
     def upload_material(self, image):
         """Uploads the material for the icon of page.
 
@@ -98,6 +160,30 @@ class ShakeService(Basic):
         json_data = self._send_request('post', url, files=files)
         return json_data
 
+    def upload_material_once(self, source, filename=None):
+        """Uploads the material for the icon of page once by its content.
+
+        The file is streamed without loading it into memory. When the service
+        has an upload index, the same bytes uploaded before return the saved
+        pic_url without a request.
+
+        Args:
+            source: the path of the image, or a file object opened in binary.
+            filename: the name of the image, the name of source by default.
+
+        Returns:
+            the json data, same as upload_material.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+
+        url = 'https://api.weixin.qq.com/shakearound/material/add'
+        json_data = self._upload_once(
+            url, 'media', source, filename,
+            'shake_material', ("data", "pic_url"))
+        return json_data
+
     def apply_devices(
             self,
             quantity, apply_reason, comment,
@@ -292,13 +378,87 @@ class ShakeService(Basic):
                 "major": major,
                 "minor": minor
             }
+        return self._search_device_identifiers([device_identifier])
+
+    def search_devices_by_identifiers(
+            self,
+            device_ids=None, uuids=None,
+            chunk_size=50, workers=4):
+        """Finds the information of many devices.
+
+        The identifiers are sent in chunks of the max number the api allows,
+        and the chunks are requested in parallel.
+
+        Args:
+            device_ids: the list of device id.
+            uuids: the list of (uuid, major, minor) of devices.
+            chunk_size: the number of devices in a request.(no more than 50)
+            workers: the number of chunks requested in parallel.
+
+        Returns:
+            the dict of identifier to the information of device, same as an
+            item of devices of search_device. Every device found is keyed by
+            both its device_id and its (uuid, major, minor).
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        arg_sets = self._chunk(
+            self._make_device_identifiers(device_ids, uuids), chunk_size)
+        results = self.bulk(
+            '_search_device_identifiers', arg_sets, workers=workers)
+        return self._index_devices(results)
+
+    def _search_device_identifiers(self, device_identifiers):
+        """Finds the information of devices by the list of identifiers."""
         data = {
-            "device_identifiers": [device_identifier]
+            "device_identifiers": device_identifiers
         }
         url = 'https://api.weixin.qq.com/shakearound/device/search'
         json_data = self._send_request('post', url, data=data)
         return json_data
 
+    @classmethod
+    def _make_device_identifiers(cls, device_ids, uuids):
+        """Makes the list of device identifiers for the api."""
+        return [
+            {"device_id": device_id} for device_id in device_ids or []
+        ] + [
+            {"uuid": uuid, "major": major, "minor": minor}
+            for uuid, major, minor in uuids or []
+        ]
+
+    @classmethod
+    def _chunk(cls, items, chunk_size):
+        """Splits a list into the chunks of chunk_size."""
+        return [
+            items[i:i + chunk_size] for i in range(0, len(items), chunk_size)
+        ]
+
+    @classmethod
+    def _index_devices(cls, results):
+        """Indexes the devices found by the chunks of identifiers.
+
+        Args:
+            results: the BulkResults of _search_device_identifiers.
+
+        Returns:
+            the dict of device_id and (uuid, major, minor) to the device.
+
+        Raises:
+            WechatError: to raise the exception if a chunk failed.
+        """
+        devices = {}
+        for result in results:
+            if result.error is not None:
+                raise result.error
+            for device in result.result["data"]["devices"]:
+                devices[device["device_id"]] = device
+                devices[(
+                    device["uuid"], device["major"], device["minor"]
+                )] = device
+        return devices
+
     def search_devices(
             self,
             begin, count,
@@ -349,6 +509,52 @@ class ShakeService(Basic):
         json_data = self._send_request('post', url, data=data)
         return json_data
 
+    def iter_devices(self, apply_id=None, count=50, workers=4):
+        """Iterates over the information of all the devices.
+
+        The first page of search_devices gives the total count, then the
+        later pages are requested in parallel by the bulk executor. The
+        devices are yielded in order and at most twice of workers pages are
+        kept in memory.
+
+        Args:
+            apply_id: the applicaition number of devices.
+            count: the number of devices in a page.(no more than 50)
+            workers: the number of pages requested in parallel.
+
+        Yields:
+            the information of a device, same as an item of devices of
+            search_devices.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        json_data = self.search_devices(0, count, apply_id)
+        for device in json_data["data"]["devices"]:
+            yield device
+
+        arg_sets = self._get_device_page_args(
+            json_data, count, apply_id)
+        results = self.bulk(
+            'search_devices', arg_sets, workers=workers, ordered=True)
+        for result in results:
+            if result.error is not None:
+                raise result.error
+            for device in result.result["data"]["devices"]:
+                yield device
+
+    @classmethod
+    def _get_device_page_args(cls, json_data, count, apply_id):
+        """Gets the argument sets of search_devices after the first page."""
+        total_count = json_data["data"].get("total_count", 0)
+        begin = len(json_data["data"]["devices"])
+        if not begin:
+            return []
+        return [
+            (offset, count, apply_id)
+            for offset in range(begin, total_count, count)
+        ]
+
     def add_page(
             self,
             title, description, page_url, icon_url,
@@ -475,6 +681,83 @@ class ShakeService(Basic):
         json_data = self._send_request('post', url, data=data)
         return json_data
 
+    def search_pages_in_chunks(self, page_ids, chunk_size=50, workers=4):
+        """Finds many pages by ids in chunks.
+
+        The ids are sent in chunks which the api allows, the chunks are
+        requested in parallel and a failed chunk does not stop the others.
+
+        Args:
+            page_ids: the list of page id.
+            chunk_size: the number of pages in a request.
+            workers: the number of chunks requested in parallel.
+
+        Returns:
+            the dict of the pages found and the failed chunks. Example:
+            {
+                "pages": [
+                    {
+                        "comment": "just for test",
+                        "description": "test",
+                        "icon_url": "https://www.baidu.com/img/bd_logo1",
+                        "page_id": 28840,
+                        "page_url": "http://xw.qq.com/testapi1",
+                        "title": "测试1"
+                    }
+                ],
+                "failures": [([28841, 28842], WechatError)]
+            }
+        """
+        results = self.bulk(
+            'search_page_by_ids', self._chunk(list(page_ids), chunk_size),
+            workers=workers)
+        return self._merge_page_chunks(results)
+
+    def delete_pages_in_chunks(self, page_ids, chunk_size=50, workers=4):
+        """Deletes many pages by ids in chunks.
+
+        The ids are sent in chunks which the api allows, the chunks are
+        requested in parallel and a failed chunk does not stop the others.
+
+        Args:
+            page_ids: the list of page id.
+            chunk_size: the number of pages in a request.
+            workers: the number of chunks requested in parallel.
+
+        Returns:
+            the dict of the ids deleted and the failed chunks. Example:
+            {
+                "page_ids": [28840],
+                "failures": [([28841, 28842], WechatError)]
+            }
+        """
+        results = self.bulk(
+            'delete_page', self._chunk(list(page_ids), chunk_size),
+            workers=workers)
+        return self._merge_deleted_chunks(results)
+
+    @classmethod
+    def _merge_page_chunks(cls, results):
+        """Merges the pages of the chunks of search_page_by_ids."""
+        merged = {"pages": [], "failures": []}
+        for result in results:
+            if result.error is not None:
+                merged["failures"].append((result.args, result.error))
+            else:
+                merged["pages"].extend(result.result["data"]["pages"])
+        return merged
+
+    @classmethod
+    def _merge_deleted_chunks(cls, results):
+        """Merges the page ids of the chunks of delete_page."""
+        merged = {"page_ids": [], "failures": []}
+        for result in results:
+            if result.error is not None:
+                merged["failures"].append((result.args, result.error))
+            else:
+                merged["page_ids"].extend(result.args)
+        return merged
+
     def search_page_by_counts(self, begin, count):
         """Finds pages by counts.
 
@@ -678,3 +961,167 @@ class ShakeService(Basic):
         url = 'https://api.weixin.qq.com/shakearound/statistics/page'
         json_data = self._send_request('post', url, data=data)
         return json_data
+
+    def device_statistics_range(
+            self,
+            begin_date, end_date,
+            device_id=None, uuid=None, major=None, minor=None,
+            workers=4):
+        """Gets the statistics of a device in a date span of any length.
+
+        The span is split into windows of 30 days which are requested in
+        parallel by device_statistics. With the statistics_cache, the closed
+        days are read from it and only the other days are requested.
+
+        Args:
+            begin_date: the timestamp of start date
+            end_date: the timestamp of end date.
+            device_id: the device id,
+                it can be None when UUID, major and minor are seted.
+            uuid: the uuid of device.
+            major: the major of device.
+            minor: the minor of device.
+            workers: the number of windows requested in parallel.
+
+        Returns:
+            the list of daily statistics sorted by ftime, one item a day.
+            Example:
+            [
+                {
+                    "click_pv": 0,
+                    "click_uv": 0,
+                    "ftime": 1425052800,
+                    "shake_pv": 0,
+                    "shake_uv": 0
+                }
+            ]
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        target = self._get_device_key(device_id, uuid, major, minor)
+        cached, spans = self._plan_statistics(
+            'device', target, begin_date, end_date)
+        arg_sets = [
+            (begin, end, device_id, uuid, major, minor)
+            for begin, end in self._split_statistics_spans(spans)
+        ]
+        results = self.bulk('device_statistics', arg_sets, workers=workers)
+        return self._finish_statistics(
+            'device', target, cached, spans, results)
+
+    def page_statistics_range(
+            self, page_id, begin_date, end_date, workers=4):
+        """Gets the statistics of a page in a date span of any length.
+
+        The span is split into windows of 30 days which are requested in
+        parallel by page_statistics. With the statistics_cache, the closed days
+        are read from it and only the other days are requested.
+
+        Args:
+            page_id: the id of page.
+            begin_date: the timestamp of start date
+            end_date: the timestamp of end date.
+            workers: the number of windows requested in parallel.
+
+        Returns:
+            the list of daily statistics sorted by ftime, one item a day.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        cached, spans = self._plan_statistics(
+            'page', page_id, begin_date, end_date)
+        arg_sets = [
+            (page_id, begin, end)
+            for begin, end in self._split_statistics_spans(spans)
+        ]
+        results = self.bulk('page_statistics', arg_sets, workers=workers)
+        return self._finish_statistics('page', page_id, cached, spans, results)
+
+    @classmethod
+    def _get_device_key(cls, device_id, uuid, major, minor):
+        """Gets the key of a device by its identifier."""
+        if device_id:
+            return str(device_id)
+        return '{0}/{1}/{2}'.format(uuid, major, minor)
+
+    def _plan_statistics(self, kind, target, begin_date, end_date):
+        """Plans the spans of statistics to request.
+
+        Args:
+            kind: the kind of statistics, 'device' or 'page'.
+            target: the key of the device or page.
+            begin_date: the timestamp of start date
+            end_date: the timestamp of end date.
+
+        Returns:
+            a tuple of (the dict of ftime to the cached statistics, the list
+            of (begin_date, end_date) of the spans to request).
+        """
+        if self.statistics_cache is None:
+            return {}, [(begin_date, end_date)]
+        return self.statistics_cache.lookup(
+            kind, target, begin_date, end_date)
+
+    def _finish_statistics(self, kind, target, cached, spans, results):
+        """Merges the requested statistics with the cached ones.
+
+        Args:
+            kind: the kind of statistics, 'device' or 'page'.
+            target: the key of the device or page.
+            cached: the dict of ftime to the cached statistics.
+            spans: the list of (begin_date, end_date) which were requested.
+            results: the BulkResults of the requests of statistics.
+
+        Returns:
+            the list of daily statistics sorted by ftime.
+
+        Raises:
+            WechatError: to raise the exception if a window failed.
+        """
+        statistics = self._merge_statistics(results)
+        if self.statistics_cache is not None:
+            self.statistics_cache.save(kind, target, spans, statistics)
+        statistics.update(cached)
+        return [statistics[ftime] for ftime in sorted(statistics)]
+
+    @classmethod
+    def _split_statistics_spans(cls, spans):
+        """Splits date spans into the windows a request of statistics allows.
+
+        Args:
+            spans: the list of (begin_date, end_date).
+
+        Returns:
+            the list of (begin_date, end_date) of the windows.
+        """
+        windows = []
+        for begin, end_date in spans:
+            while begin <= end_date:
+                end = min(
+                    begin + (STATISTICS_MAX_DAYS - 1) * ONE_DAY, end_date)
+                windows.append((begin, end))
+                begin = end + ONE_DAY
+        return windows
+
+    @classmethod
+    def _merge_statistics(cls, results):
+        """Merges the statistics of windows.
+
+        Args:
+            results: the BulkResults of the requests of statistics.
+
+        Returns:
+            the dict of ftime to the statistics of the day.
+
+        Raises:
+            WechatError: to raise the exception if a window failed.
+        """
+        statistics = {}
+        for result in results:
+            if result.error is not None:
+                raise result.error
+            for item in result.result.get("data") or []:
+                statistics[item["ftime"]] = item
+        return statistics
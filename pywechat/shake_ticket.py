@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+PAGE_URL = 'https://api.weixin.qq.com/shakearound/page/'
+
+
+class _Flight(object):
+
+    """The request of a ticket which is in flight."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ShakeTicketResolver(object):
+
+    """The resolver of the tickets of shaking for the pages of shaking.
+
+    A ticket is resolved by get_shake_info once in its ttl, the concurrent
+    resolves of one ticket wait for the same request. The result is enriched
+    with the device from a DeviceRegistry and the page from the pages it
+    knows, so it needs no search_device or search_page_by_ids. The pages are
+    learnt by put_pages, or by the responses of search_page_by_ids when its
+    update is a response listener of the service:
+
+        registry = DeviceRegistry()
+        resolver = ShakeTicketResolver(shake_service, device_registry=registry)
+        service = WechatService(
+            app_id, app_secret,
+            response_listeners=[registry.update, resolver.update])
+
+    Attributes:
+        shake_service: the service of shaking.
+        ttl: the seconds to cache the result of a ticket.
+        device_registry: the DeviceRegistry to find the device, None not to
+            add the device.
+        max_entries: the max number of tickets cached.
+    """
+
+    def __init__(
+            self, shake_service, ttl=60, device_registry=None,
+            max_entries=4096):
+        """Initializes the resolver."""
+        self.shake_service = shake_service
+        self.ttl = ttl
+        self.device_registry = device_registry
+        self.max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__pages = {}
+        self.__flights = {}
+        self.__lock = threading.Lock()
+
+    def resolve(self, ticket, need_poi=None):
+        """Resolves a ticket of shaking.
+
+        Args:
+            ticket: the ticket of business which can be getted from url.
+            need_poi: whether it needs to return poi_id.
+
+        Returns:
+            the json data of get_shake_info, its data has the device of
+            search_device in "device" and the page of search_page_by_ids in
+            "page" if they are known.
+
+        Raises:
+            WechatError: to raise the exception if it contains the error.
+        """
+        key = (ticket, need_poi)
+        with self.__lock:
+            json_data = self._get_cached(key)
+            flight = self.__flights.get(key)
+            leader = json_data is None and flight is None
+            if leader:
+                flight = self.__flights[key] = _Flight()
+
+        if json_data is not None:
+            return self._enrich(json_data)
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self._enrich(flight.result)
+
+        try:
+            flight.result = self.shake_service.get_shake_info(ticket, need_poi)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.__lock:
+                if flight.error is None:
+                    self._store(key, flight.result)
+                del self.__flights[key]
+            flight.event.set()
+        return self._enrich(flight.result)
+
+    def put_pages(self, pages):
+        """Adds or replaces the pages to enrich the results.
+
+        Args:
+            pages: the list of pages, same as the pages of
+                search_page_by_ids.
+        """
+        with self.__lock:
+            for page in pages:
+                self.__pages[page["page_id"]] = copy.deepcopy(page)
+
+    def update(self, url, data, json_data):
+        """Learns the pages by the response of a request of the service.
+
+        It is the response listener of the service. The pages found are
+        kept, and the pages updated or deleted are forgotten.
+
+        Args:
+            url: the url of the request.
+            data: the data of the request.
+            json_data: the json data of the response.
+        """
+        data = data or {}
+        if url == PAGE_URL + 'search':
+            self.put_pages(
+                (json_data.get("data") or {}).get("pages") or [])
+        elif url == PAGE_URL + 'update':
+            with self.__lock:
+                self.__pages.pop(data.get("page_id"), None)
+        elif url == PAGE_URL + 'delete':
+            with self.__lock:
+                for page_id in data.get("page_ids") or []:
+                    self.__pages.pop(page_id, None)
+
+    def _get_cached(self, key):
+        """Gets the cached result of a ticket, it is guarded by the caller."""
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self.__entries[key]
+            return None
+        return entry[1]
+
+    def _store(self, key, json_data):
+        """Caches the result of a ticket, it is guarded by the caller."""
+        now = time.time()
+        self.__entries.pop(key, None)
+        self.__entries[key] = (now + self.ttl, json_data)
+        # the entries are in order of expiry since the ttl is the same.
+        while self.__entries:
+            oldest = next(iter(self.__entries))
+            if len(self.__entries) <= self.max_entries and \
+                    self.__entries[oldest][0] > now:
+                break
+            del self.__entries[oldest]
+
+    def _enrich(self, json_data):
+        """Copies the result of a ticket and adds its device and page."""
+        json_data = copy.deepcopy(json_data)
+        data = json_data.get("data")
+        if not data:
+            return json_data
+        beacon_info = data.get("beacon_info") or {}
+        if self.device_registry is not None and beacon_info:
+            device = self.device_registry.find(
+                beacon_info.get("uuid"),
+                beacon_info.get("major"),
+                beacon_info.get("minor")
+            )
+            if device is not None:
+                data["device"] = device
+        with self.__lock:
+            page = self.__pages.get(data.get("page_id"))
+        if page is not None:
+            data["page"] = copy.deepcopy(page)
+        return json_data
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import threading
+
+
+class SQLiteStore(object):
+
+    """The basic class of the stores in a local SQLite database.
+
+    Every thread opens its own connection once and reuses it, since a
+    connection of sqlite can not be shared by threads.
+
+    Attributes:
+        path: the path of the database.
+        timeout: the seconds to wait for the lock of the database.
+    """
+
+    # the statement which creates the table of the store.
+    schema = None
+
+    def __init__(self, path, timeout=10):
+        """Initializes the store and creates its table."""
+        self.path = path
+        self.timeout = timeout
+        self.__local = threading.local()
+        with self._connect() as conn:
+            conn.execute(self.schema)
+
+    def _connect(self):
+        """Gets the connection of the current thread."""
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self.__local.conn = conn
+        return conn
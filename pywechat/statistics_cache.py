@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+from pywechat.sqlite_store import SQLiteStore
+
+ONE_DAY = 24 * 60 * 60
+# the ftime of the statistics of wechat is the midnight of Beijing time.
+FTIME_OFFSET = 8 * 60 * 60
+
+
+def get_ftime(timestamp):
+    """Gets the ftime of the day of a timestamp, the midnight of Beijing."""
+    return timestamp - (timestamp + FTIME_OFFSET) % ONE_DAY
+
+
+class StatisticsCache(SQLiteStore):
+
+    """A local SQLite store of the daily statistics of shaking.
+
+    The statistics of a day never change once the day is closed, so they are
+    stored by (kind, target, day) and only the missing or still open days
+    need to be requested from wechat. A day which returns no statistics is
+    stored as empty, so it is not requested again either. The dates are
+    snapped to the ftime of their days, so a span which does not start at
+    the midnight of Beijing still matches the days returned.
+
+    Attributes:
+        path: the path of the database.
+        closed_delay: the seconds after the end of a day when its statistics
+            are final.
+        timeout: the seconds to wait for the lock of the database.
+    """
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS statistics ('
+        'kind TEXT NOT NULL, '
+        'target TEXT NOT NULL, '
+        'ftime INTEGER NOT NULL, '
+        'data TEXT, '
+        'PRIMARY KEY (kind, target, ftime))'
+    )
+
+    def __init__(self, path, closed_delay=ONE_DAY, timeout=10):
+        """Initializes the cache."""
+        self.closed_delay = closed_delay
+        SQLiteStore.__init__(self, path, timeout)
+
+    def is_closed(self, ftime, now=None):
+        """Checks whether the statistics of a day are final."""
+        now = time.time() if now is None else now
+        return ftime + ONE_DAY + self.closed_delay <= now
+
+    def lookup(self, kind, target, begin_date, end_date, now=None):
+        """Looks up the statistics of the closed days in a span.
+
+        Args:
+            kind: the kind of statistics, 'device' or 'page'.
+            target: the key of the device or page.
+            begin_date: the timestamp of start date.
+            end_date: the timestamp of end date.
+            now: the timestamp of now.
+
+        Returns:
+            a tuple of (the dict of ftime to the cached statistics, the list
+            of (begin_date, end_date) of the spans to request, which are
+            the ftimes of their days).
+        """
+        begin_date = get_ftime(begin_date)
+        end_date = get_ftime(end_date)
+        rows = self._connect().execute(
+            'SELECT ftime, data FROM statistics '
+            'WHERE kind = ? AND target = ? AND ftime BETWEEN ? AND ?',
+            (kind, str(target), begin_date, end_date)
+        ).fetchall()
+        known = set()
+        items = {}
+        for ftime, data in rows:
+            known.add(ftime)
+            if data is not None:
+                items[ftime] = json.loads(data)
+
+        spans = []
+        for ftime in range(begin_date, end_date + 1, ONE_DAY):
+            if ftime in known and self.is_closed(ftime, now):
+                continue
+            if spans and spans[-1][1] == ftime - ONE_DAY:
+                spans[-1] = (spans[-1][0], ftime)
+            else:
+                spans.append((ftime, ftime))
+        return items, spans
+
+    def save(self, kind, target, spans, items, now=None):
+        """Saves the statistics of the closed days of the requested spans.
+
+        Args:
+            kind: the kind of statistics, 'device' or 'page'.
+            target: the key of the device or page.
+            spans: the list of (begin_date, end_date) which were requested.
+            items: the dict of ftime to the statistics returned.
+            now: the timestamp of now.
+        """
+        rows = []
+        for begin_date, end_date in spans:
+            for ftime in range(
+                    get_ftime(begin_date), get_ftime(end_date) + 1, ONE_DAY):
+                if not self.is_closed(ftime, now):
+                    continue
+                item = items.get(ftime)
+                rows.append((
+                    kind, str(target), ftime,
+                    None if item is None else json.dumps(item)
+                ))
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO statistics '
+                '(kind, target, ftime, data) VALUES (?, ?, ?, ?)',
+                rows
+            )
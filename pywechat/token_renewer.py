@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRenewer(threading.Thread):
+
+    """A background thread which renews the access token before it expires.
+
+    The token is renewed when the given fraction of its lifetime has passed.
+    The old token is kept in the token store until the new one is granted,
+    so the requests never wait for the token.
+
+    Attributes:
+        service: the service whose access token is renewed.
+        ratio: the fraction of the lifetime after which the token is renewed.
+        retry_interval: the seconds to wait before retrying a failed renewal.
+        lifetime: the seconds an access token lives, updated by each grant.
+    """
+
+    def __init__(self, service, ratio=0.8, retry_interval=30, lifetime=7200):
+        """Initializes the renewer."""
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.service = service
+        self.ratio = ratio
+        self.retry_interval = retry_interval
+        self.lifetime = lifetime
+        self.__stopped = threading.Event()
+
+    def run(self):
+        while not self.__stopped.is_set():
+            # waits at least a second to avoid a busy loop.
+            self.__stopped.wait(max(self.renew(), 1))
+
+    def stop(self):
+        """Stops the renewer."""
+        self.__stopped.set()
+
+    def renew(self):
+        """Renews the access token if it is due.
+
+        Returns:
+            the seconds to wait before the next renewal.
+        """
+        access_token, expires_at = self.service._load_access_token()
+        if access_token and expires_at:
+            renew_at = expires_at - self.lifetime * (1 - self.ratio)
+            if renew_at > time.time():
+                return renew_at - time.time()
+        try:
+            json_data = self.service._refresh_access_token(access_token)
+        except Exception:
+            logger.exception('Failed to renew the access token.')
+            return self.retry_interval
+        if json_data and json_data.get('expires_in'):
+            self.lifetime = json_data['expires_in']
+        # checks the new token at once to schedule the next renewal.
+        return 0
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+
+from pywechat.json_file import dump_json
+from pywechat.sqlite_store import SQLiteStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class BaseTokenStore(object):
+
+    """The basic class of all token stores.
+
+    A token store keeps the access token and the time it expires at, so that
+    every service, thread and process reading the same store shares one
+    token instead of granting its own.
+    """
+
+    def get(self, key):
+        """Gets the token.
+
+        Args:
+            key: the key of token, usually the app id.
+
+        Returns:
+            a tuple of (access_token, expires_at), or None if it is missing.
+        """
+        raise NotImplementedError
+
+    def set(self, key, access_token, expires_at):
+        """Sets the token.
+
+        Args:
+            key: the key of token, usually the app id.
+            access_token: the access token.
+            expires_at: the timestamp the access token will expire at.
+        """
+        raise NotImplementedError
+
+
+class MemoryTokenStore(BaseTokenStore):
+
+    """A token store in the memory of the process."""
+
+    def __init__(self):
+        """Initializes the store."""
+        self.__tokens = {}
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        with self.__lock:
+            return self.__tokens.get(key)
+
+    def set(self, key, access_token, expires_at):
+        with self.__lock:
+            self.__tokens[key] = (access_token, expires_at)
+
+
+class FileTokenStore(BaseTokenStore):
+
+    """A token store in a local json file.
+
+    The file is locked while it is read or written, so the processes on one
+    node can share it.
+
+    Attributes:
+        path: the path of the file.
+    """
+
+    def __init__(self, path):
+        """Initializes the store."""
+        self.path = path
+        self.__lock = threading.Lock()
+
+    def _lock_file(self, lock_file, exclusive):
+        if fcntl is not None:
+            fcntl.flock(
+                lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _read(self):
+        try:
+            with open(self.path) as token_file:
+                return json.load(token_file)
+        except (IOError, ValueError):
+            return {}
+
+    def get(self, key):
+        with self.__lock:
+            with open(self.path + '.lock', 'a') as lock_file:
+                self._lock_file(lock_file, False)
+                value = self._read().get(key)
+        if not value:
+            return None
+        return value[0], value[1]
+
+    def set(self, key, access_token, expires_at):
+        with self.__lock:
+            with open(self.path + '.lock', 'a') as lock_file:
+                self._lock_file(lock_file, True)
+                tokens = self._read()
+                tokens[key] = [access_token, expires_at]
+                dump_json(tokens, self.path)
+
+
+class SQLiteTokenStore(BaseTokenStore, SQLiteStore):
+
+    """A token store in a SQLite database.
+
+    Attributes:
+        path: the path of the database.
+        timeout: the seconds to wait for the lock of the database.
+    """
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS access_tokens ('
+        'key TEXT PRIMARY KEY, '
+        'access_token TEXT NOT NULL, '
+        'expires_at INTEGER NOT NULL)'
+    )
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT access_token, expires_at FROM access_tokens '
+            'WHERE key = ?', (key,)
+        ).fetchone()
+        if not row:
+            return None
+        return row[0], row[1]
+
+    def set(self, key, access_token, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO access_tokens '
+                '(key, access_token, expires_at) VALUES (?, ?, ?)',
+                (key, access_token, expires_at)
+            )
+
+
+class KeyValueTokenStore(BaseTokenStore):
+
+    """A token store over a key-value client such as memcache or redis.
+
+    The client only needs the methods of get(key) and set(key, value).
+
+    Attributes:
+        client: the client of key-value storage.
+        prefix: the prefix of keys.
+        ttl_arg: the name of the argument of set() which takes the seconds
+            to live, e.g. 'time' for memcache and 'ex' for redis.
+    """
+
+    def __init__(self, client, prefix='pywechat:access_token:', ttl_arg=None):
+        """Initializes the store."""
+        self.client = client
+        self.prefix = prefix
+        self.ttl_arg = ttl_arg
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if not value:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        value = json.loads(value)
+        return value[0], value[1]
+
+    def set(self, key, access_token, expires_at):
+        kwargs = {}
+        if self.ttl_arg:
+            kwargs[self.ttl_arg] = max(int(expires_at - time.time()), 1)
+        self.client.set(
+            self.prefix + key,
+            json.dumps([access_token, expires_at]),
+            **kwargs
+        )
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import uuid
+
+from pywechat.sqlite_store import SQLiteStore
+
+CHUNK_SIZE = 64 * 1024
+# the streams which can not seek are spooled into a temporary file, in
+# memory until they are larger than it.
+SPOOL_SIZE = 1024 * 1024
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+class Upload(object):
+
+    """A file to upload, opened from a path or a stream.
+
+    The file is hashed once when it is opened, the stream is kept at its
+    start to be sent. A stream which can not seek is spooled into a
+    temporary file. It closes the files it opened when it is closed.
+
+    Attributes:
+        file: the seekable file to send.
+        filename: the name of the file in the multipart form.
+        digest: the hex sha256 of the content.
+        size: the bytes of the content.
+    """
+
+    def __init__(self, source, filename=None):
+        """Opens the upload.
+
+        Args:
+            source: the path of the file, or a file object opened in binary.
+            filename: the name of the file, the name of source by default.
+        """
+        self.__owned = False
+        if isinstance(source, string_types):
+            source = open(source, 'rb')
+            self.__owned = True
+        elif not self._is_seekable(source):
+            spool = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+            self.__copy(source, spool)
+            spool.seek(0)
+            filename = filename or getattr(source, 'name', None)
+            source = spool
+            self.__owned = True
+        self.file = source
+        self.filename = os.path.basename(
+            filename or getattr(source, 'name', None) or 'media')
+        self.__start = source.tell()
+        self.digest, self.size = self.__hash()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the file if it was opened by the upload."""
+        if self.__owned:
+            self.file.close()
+
+    def rewind(self):
+        """Moves the file back to the start of the content."""
+        self.file.seek(self.__start)
+
+    def read_at(self, offset, size):
+        """Reads the content from an offset.
+
+        Args:
+            offset: the offset from the start of the content.
+            size: the max number of bytes.
+
+        Returns:
+            the bytes read.
+        """
+        self.file.seek(self.__start + offset)
+        return self.file.read(size)
+
+    def __hash(self):
+        """Hashes the content and rewinds the file."""
+        sha256 = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = self.file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            size += len(chunk)
+        self.rewind()
+        return sha256.hexdigest(), size
+
+    @classmethod
+    def _is_seekable(cls, source):
+        """Checks whether a file object can seek."""
+        seekable = getattr(source, 'seekable', None)
+        if seekable is not None:
+            return seekable()
+        return hasattr(source, 'seek') and hasattr(source, 'tell')
+
+    @classmethod
+    def __copy(cls, source, target):
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            target.write(chunk)
+
+
+class MultipartStream(io.RawIOBase):
+
+    """The body of a multipart form with one file, read as a stream.
+
+    The file is read in chunks while the body is sent, it is never loaded
+    into memory as a whole. The len of the body is known before, so requests
+    sends it with a Content-Length instead of chunks.
+
+    Attributes:
+        upload: the Upload it sends.
+        boundary: the boundary of the form.
+        content_type: the Content-Type header of the body.
+        len: the bytes of the body.
+    """
+
+    def __init__(self, name, upload):
+        """Initializes the stream.
+
+        Args:
+            name: the name of the field of the file.
+            upload: the Upload to send.
+        """
+        io.RawIOBase.__init__(self)
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={0}'.format(
+            self.boundary)
+        file_type = mimetypes.guess_type(upload.filename)[0] or \
+            'application/octet-stream'
+        head = (
+            '--{0}\r\n'
+            'Content-Disposition: form-data; name="{1}"; filename="{2}"\r\n'
+            'Content-Type: {3}\r\n\r\n'
+        ).format(self.boundary, name, upload.filename, file_type)
+        head = head.encode('utf-8')
+        tail = '\r\n--{0}--\r\n'.format(self.boundary).encode('utf-8')
+        self.upload = upload
+        # the parts of (offset in the body, size, bytes or None for the file).
+        self.__parts = []
+        offset = 0
+        for size, content in (
+                (len(head), head), (upload.size, None), (len(tail), tail)):
+            self.__parts.append((offset, size, content))
+            offset += size
+        self.len = offset
+        self.__position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.__position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.__position
+        elif whence == os.SEEK_END:
+            offset += self.len
+        self.__position = max(0, min(offset, self.len))
+        return self.__position
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.len - self.__position
+        chunks = []
+        while size > 0 and self.__position < self.len:
+            chunk = self.__read_part(size)
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.__position += len(chunk)
+        return b''.join(chunks)
+
+    def __read_part(self, size):
+        """Reads the part at the position, no more than size bytes."""
+        for offset, part_size, content in self.__parts:
+            if offset + part_size <= self.__position:
+                continue
+            start = self.__position - offset
+            size = min(size, part_size - start)
+            if content is not None:
+                return content[start:start + size]
+            chunk = self.upload.read_at(start, size)
+            if len(chunk) != size:
+                raise IOError('The file changed while it was uploaded.')
+            return chunk
+        return b''
+
+
+class UploadIndex(SQLiteStore):
+
+    """A local SQLite index of the uploaded content to the returned url.
+
+    The same bytes uploaded again are answered by the index, so the logos and
+    icons used by many cards and pages are uploaded once.
+
+    Attributes:
+        path: the path of the database.
+        timeout: the seconds to wait for the lock of the database.
+    """
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS uploads ('
+        'kind TEXT NOT NULL, '
+        'digest TEXT NOT NULL, '
+        'url TEXT NOT NULL, '
+        'PRIMARY KEY (kind, digest))'
+    )
+
+    def get(self, kind, digest):
+        """Gets the url of an uploaded content.
+
+        Args:
+            kind: the kind of upload, such as 'card_image'.
+            digest: the digest of the content.
+
+        Returns:
+            the url, or None if it was not uploaded.
+        """
+        row = self._connect().execute(
+            'SELECT url FROM uploads WHERE kind = ? AND digest = ?',
+            (kind, digest)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, kind, digest, url):
+        """Saves the url of an uploaded content."""
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO uploads (kind, digest, url) '
+                'VALUES (?, ?, ?)',
+                (kind, digest, url)
+            )
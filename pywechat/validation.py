@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+import struct
+import unicodedata
+
+from pywechat.excepts import ValidationError
+from pywechat.services.wechat_shake import ONE_DAY, STATISTICS_MAX_DAYS
+
+SHAKE_URL = 'https://api.weixin.qq.com/shakearound/'
+CARD_URL = 'https://api.weixin.qq.com/card/'
+# the bytes read from an image to find its size.
+IMAGE_HEAD_SIZE = 64 * 1024
+
+# the rules of the documented limits of the urls. A rule is the path of a
+# value in the keyword arguments of the request to its checks, '*' of a path
+# matches every dict in a dict. The values which are missing are skipped.
+# A width counts a wide character, such as a chinese one, as two.
+DEFAULT_RULES = {
+    SHAKE_URL + 'device/applyid': {
+        'data.quantity': {'min': 1, 'max': 499},
+        'data.apply_reason': {'max_width': 200},
+        'data.comment': {'max_width': 30},
+    },
+    SHAKE_URL + 'device/update': {
+        'data.comment': {'max_width': 30},
+    },
+    SHAKE_URL + 'device/search': {
+        'data.count': {'min': 1, 'max': 50},
+        'data.device_identifiers': {'max_items': 50},
+    },
+    SHAKE_URL + 'page/add': {
+        'data.title': {'max_width': 12},
+        'data.description': {'max_width': 14},
+        'data.comment': {'max_width': 30},
+    },
+    SHAKE_URL + 'page/update': {
+        'data.title': {'max_width': 12},
+        'data.description': {'max_width': 14},
+        'data.comment': {'max_width': 30},
+    },
+    SHAKE_URL + 'page/search': {
+        'data.count': {'min': 1, 'max': 50},
+    },
+    SHAKE_URL + 'material/add': {
+        'files.media': {'max_image_size': (200, 200)},
+        'data': {'max_image_size': (200, 200)},
+    },
+    SHAKE_URL + 'statistics/device': {
+        'data': {'max_days': STATISTICS_MAX_DAYS},
+    },
+    SHAKE_URL + 'statistics/page': {
+        'data': {'max_days': STATISTICS_MAX_DAYS},
+    },
+    CARD_URL + 'batchget': {
+        'data.count': {'min': 1, 'max': 50},
+    },
+    CARD_URL + 'create': {
+        'data.card.*.base_info.color': {'choices': 'colors'},
+    },
+    CARD_URL + 'update': {
+        'data.*.base_info.color': {'choices': 'colors'},
+    },
+}
+
+
+class Validator(object):
+
+    """The local checks of the data of requests.
+
+    The rules are compiled into the checks of every url when it is built, a
+    request which breaks a rule raises a ValidationError before it is sent,
+    so it costs no quota. ValidationError is a WechatError, so a bulk keeps
+    it in the result of the call.
+
+        validator = Validator()
+        service = WechatService(app_id, app_secret, validator=validator)
+        validator.load_colors(service.init_service('Card'))
+
+    Attributes:
+        rules: the dict of url to its rules, see DEFAULT_RULES.
+        colors: the set of the names of colors of cards, None not to check
+            the colors.
+    """
+
+    def __init__(self, rules=None, colors=None):
+        """Initializes the validator and compiles its rules."""
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.colors = set(colors) if colors is not None else None
+        self.__checks = dict(
+            (url, self._compile(url_rules))
+            for url, url_rules in self.rules.items()
+        )
+
+    def validate(self, url, kwargs):
+        """Checks the keyword arguments of a request.
+
+        Args:
+            url: the request's url.
+            kwargs: the keyword arguments of the request before it is
+                encoded.
+
+        Raises:
+            ValidationError: the request breaks a rule.
+        """
+        for check in self.__checks.get(url, ()):
+            check(kwargs)
+
+    def load_colors(self, card_service):
+        """Loads the colors of cards by get_colors of a card service.
+
+        An asyncio service can pass the json data of get_colors to
+        set_colors instead.
+        """
+        self.set_colors(card_service.get_colors())
+
+    def set_colors(self, json_data):
+        """Sets the colors of cards by the json data of get_colors."""
+        self.colors = set(
+            color["name"] for color in json_data.get("colors") or [])
+
+    def _compile(self, url_rules):
+        """Compiles the rules of a url into a list of checks."""
+        checks = []
+        for path, rules in url_rules.items():
+            keys = path.split('.')
+            for name, argument in rules.items():
+                checks.append(self._make_check(
+                    path, keys, getattr(self, '_check_' + name), argument))
+        return checks
+
+    @classmethod
+    def _make_check(cls, path, keys, check, argument):
+        """Makes the check of a rule on the values at the keys."""
+        def check_values(kwargs):
+            for value in cls._find_values(kwargs, keys):
+                error = check(value, argument)
+                if error is not None:
+                    raise ValidationError(path, error)
+        return check_values
+
+    @classmethod
+    def _find_values(cls, value, keys):
+        """Finds the values at the keys, '*' matches every dict in a dict."""
+        values = [value]
+        for key in keys:
+            found = []
+            for value in values:
+                if not isinstance(value, dict):
+                    continue
+                if key == '*':
+                    found.extend(
+                        item for item in value.values()
+                        if isinstance(item, dict))
+                elif value.get(key) is not None:
+                    found.append(value[key])
+            values = found
+        return values
+
+    def _check_min(self, value, minimum):
+        if value < minimum:
+            return 'must not be less than {0}'.format(minimum)
+
+    def _check_max(self, value, maximum):
+        if value > maximum:
+            return 'must not be more than {0}'.format(maximum)
+
+    def _check_max_items(self, value, maximum):
+        if len(value) > maximum:
+            return 'must not have more than {0} items'.format(maximum)
+
+    def _check_max_width(self, value, maximum):
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        width = sum(
+            2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+            for char in value
+        )
+        if width > maximum:
+            return 'must not be wider than {0} letters'.format(maximum)
+
+    def _check_max_days(self, value, maximum):
+        begin_date = value.get("begin_date")
+        end_date = value.get("end_date")
+        if begin_date is None or end_date is None:
+            return None
+        if begin_date > end_date:
+            return 'begin_date must not be after end_date'
+        if (end_date - begin_date) // ONE_DAY + 1 > maximum:
+            return 'must not span more than {0} days'.format(maximum)
+
+    def _check_choices(self, value, name):
+        choices = getattr(self, name)
+        if choices is not None and value not in choices:
+            return 'must be one of the {0}'.format(name)
+
+    def _check_max_image_size(self, value, maximum):
+        size = get_image_size(read_head(value))
+        if size is None:
+            return None
+        if size[0] > maximum[0] or size[1] > maximum[1]:
+            return 'the image must not be larger than {0}*{1} px'.format(
+                *maximum)
+
+
+def read_head(source):
+    """Reads the head of a file, an Upload or a MultipartStream.
+
+    The position of the file is kept.
+
+    Returns:
+        the bytes of the head, or None if it can not be read.
+    """
+    source = getattr(source, 'upload', source)
+    if hasattr(source, 'read_at'):
+        return source.read_at(0, IMAGE_HEAD_SIZE)
+    if not (hasattr(source, 'read') and hasattr(source, 'seek')):
+        return None
+    position = source.tell()
+    try:
+        return source.read(IMAGE_HEAD_SIZE)
+    finally:
+        source.seek(position)
+
+
+def get_image_size(head):
+    """Gets the size of a png, gif or jpeg image from its head.
+
+    Returns:
+        the tuple of (width, height), or None if it is unknown.
+    """
+    if not head:
+        return None
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and len(head) >= 24:
+        return struct.unpack('>II', head[16:24])
+    if head[:6] in (b'GIF87a', b'GIF89a') and len(head) >= 10:
+        return struct.unpack('<HH', head[6:10])
+    if head[:2] != b'\xff\xd8':
+        return None
+    # walks the segments of jpeg to the start of frame.
+    offset = 2
+    while offset + 9 <= len(head):
+        if head[offset:offset + 1] != b'\xff':
+            return None
+        marker = ord(head[offset + 1:offset + 2])
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            height, width = struct.unpack('>HH', head[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + struct.unpack('>H', head[offset + 2:offset + 4])[0]
+    return None
@@ -15,5 +15,10 @@ setup(
     long_description="A python SDK for the wechat public platform.",
     install_requires=map(lambda x: x.replace('==', '>='),
         open("requirements.txt").readlines()),
+    extras_require={
+        'async': ['aiohttp>=3.0'],
+        'analytics': ['numpy'],
+        'orjson': ['orjson'],
+    },
     packages=find_packages(),
 )
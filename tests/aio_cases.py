@@ -0,0 +1,187 @@
+#-*- coding: utf-8 -*-
+"""The cases of the asyncio services, imported by test_aio on Python 3.7+."""
+import asyncio
+import time
+import mock
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.aio import (
+    AsyncBasic, AsyncShakeTicketResolver, AsyncWechatService)
+from pywechat.excepts import CodeBuildError, RateLimitError, WechatError
+from pywechat.rate_limit import RateLimiter
+
+
+class AsyncWechatServiceTest(unittest.TestCase):
+
+    '''Creates a TestCase for the asyncio services.'''
+
+    def setUp(self):
+        self.service = AsyncWechatService(CONST.STRING, CONST.STRING)
+
+    def test_init_service(self):
+        with self.assertRaises(CodeBuildError):
+            self.service.init_service(CONST.STRING)
+        shake_service = self.service.init_service('Shake')
+        card_service = self.service.init_service('Card')
+        ok_(self.service.init_service('Shake') is shake_service)
+        ok_(shake_service.session is card_service.session)
+
+    def test_awaitable_method(self):
+        card_id = CONST.STRING
+        card_service = self.service.init_service('Card')
+
+        async def send_request(method, url, **kwargs):
+            return {"card_id_list": [card_id], "total_num": 1}
+
+        with mock.patch.object(card_service, '_send_request',
+                               side_effect=send_request):
+            data = asyncio.run(card_service.batchget_card(0, 1))
+            eq_(data["card_id_list"], [card_id])
+
+    def test_access_token_single_flight(self):
+        app_id = CONST.STRING
+        access_token = CONST.STRING
+        basic = AsyncBasic(app_id, CONST.STRING)
+
+        async def grant_access_token():
+            await asyncio.sleep(0.01)
+            basic.token_store.set(
+                app_id, access_token, int(time.time()) + 7200)
+
+        async def get_tokens():
+            return await asyncio.gather(
+                *[basic._get_access_token() for _ in range(10)])
+
+        with mock.patch.object(basic, '_grant_access_token',
+                               side_effect=grant_access_token) as mock_method:
+            eq_(asyncio.run(get_tokens()), [access_token] * 10)
+            eq_(mock_method.call_count, 1)
+
+    def test_bulk(self):
+        card_service = self.service.init_service('Card')
+
+        async def get_card(card_id):
+            await asyncio.sleep(0)
+            if card_id == 3:
+                raise WechatError(CONST.NUMBER)
+            return {"card_id": card_id}
+
+        async def collect():
+            return [result async for result in card_service.bulk(
+                get_card, range(10), workers=3, ordered=True)]
+
+        results = asyncio.run(collect())
+        eq_([result.args for result in results], list(range(10)))
+        ok_(results[3].error is not None)
+        eq_(results[4].result, {"card_id": 4})
+
+    def test_rate_limit(self):
+        card_service = AsyncBasic(
+            CONST.STRING, CONST.STRING,
+            rate_limiter=RateLimiter(default=(20, 1)))
+        app_id = CONST.STRING
+        url = CONST.STRING
+
+        async def acquire():
+            rate_limiter = card_service.rate_limiter
+            await rate_limiter.acquire_async(app_id, url)
+            started_at = time.time()
+            await rate_limiter.acquire_async(app_id, url)
+            ok_(time.time() - started_at > 0.02)
+            with self.assertRaises(RateLimitError):
+                await rate_limiter.acquire_async(app_id, url, timeout=0)
+
+        async def send_request(method, url, **kwargs):
+            return card_service._get_rate_limit_timeout()
+
+        async def collect():
+            with card_service.override_rate_limit_timeout(0):
+                eq_(await card_service._send_request('get', url), 0)
+            eq_(await card_service._send_request('get', url), None)
+            return [result async for result in card_service.bulk(
+                send_request, [('get', url)], rate_limit_timeout=1)]
+
+        asyncio.run(acquire())
+        with mock.patch.object(card_service, '_send_request',
+                               side_effect=send_request):
+            eq_(asyncio.run(collect())[0].result, 1)
+
+    def test_iter_cards(self):
+        card_ids = [CONST.STRING for _ in range(7)]
+        card_service = self.service.init_service('Card')
+
+        async def batchget_card(offset, count):
+            return {
+                "card_id_list": card_ids[offset:offset + count],
+                "total_num": len(card_ids)
+            }
+
+        async def get_card(card_id):
+            return {"card": card_id}
+
+        async def collect():
+            return [result async for result in card_service.iter_cards(3)]
+
+        with mock.patch.object(card_service, 'batchget_card',
+                               side_effect=batchget_card):
+            with mock.patch.object(card_service, 'get_card',
+                                   side_effect=get_card):
+                results = asyncio.run(collect())
+        eq_([result.result["card"] for result in results], card_ids)
+
+    def test_iter_devices(self):
+        devices = [{"device_id": device_id} for device_id in range(23)]
+        shake_service = self.service.init_service('Shake')
+
+        async def search_devices(begin, count, apply_id=None):
+            return {
+                "data": {
+                    "devices": devices[begin:begin + count],
+                    "total_count": len(devices)
+                }
+            }
+
+        async def collect():
+            return [device async for device in
+                    shake_service.iter_devices(count=5)]
+
+        with mock.patch.object(shake_service, 'search_devices',
+                               side_effect=search_devices):
+            eq_(asyncio.run(collect()), devices)
+
+    def test_bind_pages_in_bulk(self):
+        shake_service = self.service.init_service('Shake')
+        report = {10011: None, 10012: WechatError(CONST.NUMBER)}
+        bindings = {10011: [1], 10012: [1]}
+
+        async def bind_page(**kwargs):
+            return {"data": {}, "errcode": 0, "errmsg": "success."}
+
+        with mock.patch.object(shake_service, 'bind_page',
+                               side_effect=bind_page) as mock_method:
+            report = asyncio.run(shake_service.bind_pages_in_bulk(
+                bindings, report=report))
+            eq_(report, {10011: None, 10012: None})
+            eq_(mock_method.call_count, 1)
+
+    def test_shake_ticket_resolver(self):
+        shake_service = self.service.init_service('Shake')
+        resolver = AsyncShakeTicketResolver(shake_service)
+        ticket = CONST.STRING
+        json_data = {"data": {"page_id": 1}, "errcode": 0}
+
+        async def get_shake_info(ticket, need_poi):
+            await asyncio.sleep(0.01)
+            return json_data
+
+        async def resolve():
+            return await asyncio.gather(
+                *[resolver.resolve(ticket) for _ in range(5)])
+
+        with mock.patch.object(shake_service, 'get_shake_info',
+                               side_effect=get_shake_info) as mock_method:
+            eq_(asyncio.run(resolve()), [json_data] * 5)
+            eq_(asyncio.run(resolver.resolve(ticket)), json_data)
+            eq_(mock_method.call_count, 1)
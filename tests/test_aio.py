@@ -0,0 +1,20 @@
+#-*- coding: utf-8 -*-
+import sys
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# the cases use the syntax of Python 3.7+, they can not be compiled before.
+if sys.version_info >= (3, 7) and aiohttp is not None:
+    from .aio_cases import AsyncWechatServiceTest
+else:
+    @unittest.skip('It needs Python 3.7+ and aiohttp.')
+    class AsyncWechatServiceTest(unittest.TestCase):
+
+        '''Creates a TestCase for the asyncio services.'''
+
+        def test_skipped(self):
+            pass
@@ -0,0 +1,78 @@
+#-*- coding: utf-8 -*-
+import mock
+import unittest
+from nose.tools import eq_, ok_
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if numpy is not None:
+    from pywechat.analytics import StatisticsFrame, ONE_DAY
+else:
+    ONE_DAY = 24 * 60 * 60
+
+# 2015-03-02 00:00 of Beijing time, a Monday.
+MONDAY = 1425225600
+
+
+def _series(shake_pvs):
+    return [
+        {
+            "click_pv": 0,
+            "click_uv": 0,
+            "ftime": MONDAY + i * ONE_DAY,
+            "shake_pv": shake_pv,
+            "shake_uv": 1
+        }
+        for i, shake_pv in enumerate(shake_pvs)
+    ]
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class StatisticsFrameTest(unittest.TestCase):
+
+    '''Creates a TestCase for the frame of statistics.'''
+
+    def setUp(self):
+        self.frame = StatisticsFrame.from_series({
+            1: _series([1, 2, 3, 4, 5, 6, 7, 8]),
+            2: _series([10, 10]),
+            3: []
+        })
+
+    def test_totals(self):
+        eq_(len(self.frame), 10)
+        eq_(self.frame.totals('shake_pv'), {1: 36, 2: 20, 3: 0})
+
+    def test_rollup(self):
+        eq_(self.frame.rollup({1: 'a', 2: 'a', 3: 'b'}, 'shake_pv'),
+            {'a': 56, 'b': 0})
+        eq_(self.frame.rollup({1: [7, 8], 2: [8]}, 'shake_uv'),
+            {7: 8, 8: 10})
+
+    def test_per_period(self):
+        eq_(self.frame.per_period('shake_pv', 'week'),
+            [(MONDAY, 48), (MONDAY + 7 * ONE_DAY, 8)])
+        eq_(self.frame.per_period('shake_pv', 'month'),
+            [(MONDAY - ONE_DAY, 56)])
+        eq_(self.frame.per_period('shake_pv')[0], (MONDAY, 11))
+
+    def test_top(self):
+        eq_(self.frame.top('shake_pv', 2), [(1, 36), (2, 20)])
+
+    def test_day_over_day(self):
+        eq_(self.frame.day_over_day('shake_pv')[:2],
+            [(MONDAY + ONE_DAY, 1), (MONDAY + 2 * ONE_DAY, -9)])
+        eq_(self.frame.day_over_day('shake_pv', key=2),
+            [(MONDAY + ONE_DAY, 0)])
+
+    def test_fetch_devices(self):
+        shake_service = mock.Mock()
+        shake_service.bulk.return_value = [
+            mock.Mock(args={"device_id": 1}, result=_series([1]), error=None)
+        ]
+        frame = StatisticsFrame.fetch_devices(
+            shake_service, [1], MONDAY, MONDAY)
+        eq_(frame.totals('shake_pv'), {1: 1})
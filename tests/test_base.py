@@ -1,13 +1,26 @@
 #-*- coding: utf-8 -*-
 import json
+import os
+import shutil
+import tempfile
+import time
 import mock
+import threading
 import unittest
 from nose.tools import eq_, ok_
 from .constants import CONST
 
 from pywechat import WechatService
-from pywechat.excepts import WechatError, CodeBuildError
+from pywechat.codec import JSONCodec
+from pywechat.metrics import Metrics
+from pywechat.excepts import (
+    WechatError, CodeBuildError, RateLimitError, ValidationError)
+from pywechat.rate_limit import RateLimiter
+from pywechat.response_cache import ResponseCache
+from pywechat.retry import RetryPolicy
 from pywechat.services.basic import Basic
+from pywechat.statistics_cache import StatisticsCache
+from pywechat.validation import SHAKE_URL, Validator
 
 
 class TestCase(unittest.TestCase):
@@ -31,6 +44,31 @@ class WechatServiceTest(TestCase):
             self.service.init_service('Shake')
             self.service.init_service('Card')
 
+    def test_init_service_lazily(self):
+        '''Tests the service is built without requests and cached.'''
+        with mock.patch.object(Basic, '_send_request') as mock_method:
+            shake_service = self.service.init_service('Shake')
+            ok_(self.service.init_service('Shake') is shake_service)
+            eq_(mock_method.call_count, 0)
+
+    def test_shared_session(self):
+        '''Tests the services share the session of the factory.'''
+        with mock.patch.object(Basic, 'access_token', autospec=True):
+            shake_service = self.service.init_service('Shake')
+            card_service = self.service.init_service('Card')
+        ok_(shake_service.session is self.service.session)
+        ok_(card_service.session is self.service.session)
+
+    def test_shared_statistics_cache(self):
+        '''Tests the services share the statistics cache of the factory.'''
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        statistics_cache = StatisticsCache(os.path.join(path, 'stats.db'))
+        service = WechatService(
+            CONST.STRING, CONST.STRING, statistics_cache=statistics_cache)
+        shake_service = service.init_service('Shake')
+        ok_(shake_service.statistics_cache is statistics_cache)
+
 
 class BasicTest(unittest.TestCase):
 
@@ -60,6 +98,198 @@ class BasicTest(unittest.TestCase):
             ok_(self.basic._send_request('get', CONST.STRING))
             ok_(self.basic._send_request('post', CONST.STRING))
 
+    def test_send_request_by_session(self):
+        '''Tests the _send_request method uses the pooled session.'''
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"errcode": 0}
+            data = self.basic._send_request(
+                'get', CONST.STRING, params={"key": CONST.STRING})
+            eq_(data, {"errcode": 0})
+            eq_(mock_session.request.call_count, 1)
+
+    def test_send_request_codec(self):
+        '''Tests the _send_request method encodes by the json codec.'''
+        self.basic.json_codec = JSONCodec()
+        data = {"key": CONST.STRING}
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.content = b'{"errcode": 0}'
+            eq_(self.basic._send_request(
+                'post', CONST.STRING, params={"key": CONST.STRING},
+                data=data), {"errcode": 0})
+            body = mock_session.request.call_args[1]['data']
+            eq_(json.loads(body.decode('utf-8')), data)
+
+    def test_send_request_rate_limit(self):
+        '''Tests the _send_request method fails fast on the rate limit.'''
+        self.basic.rate_limiter = RateLimiter(default=(1, 1))
+        self.basic.rate_limit_timeout = 0
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"errcode": 0}
+            params = {"key": CONST.STRING}
+            url = CONST.STRING
+            self.basic._send_request('get', url, params=params)
+            with self.assertRaises(RateLimitError):
+                self.basic._send_request('get', url, params=params)
+            eq_(mock_session.request.call_count, 1)
+
+    def test_override_rate_limit_timeout(self):
+        '''Tests rate_limit_timeout is overridden in a block and a bulk.'''
+        self.basic.rate_limiter = RateLimiter(default=(1, 1))
+        self.basic.rate_limit_timeout = 60
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"errcode": 0}
+            params = {"key": CONST.STRING}
+            url = CONST.STRING
+            self.basic._send_request('get', url, params=params)
+            with self.basic.override_rate_limit_timeout(0):
+                with self.assertRaises(RateLimitError):
+                    self.basic._send_request('get', url, params=params)
+            eq_(self.basic._get_rate_limit_timeout(), 60)
+
+            def send_request():
+                return self.basic._send_request('get', url, params=params)
+
+            results = list(self.basic.bulk(
+                send_request, [()], rate_limit_timeout=0))
+            ok_(isinstance(results[0].error, RateLimitError))
+            eq_(mock_session.request.call_count, 1)
+
+    def test_send_request_token_invalid(self):
+        '''Tests the _send_request method replays with a new token.'''
+        app_id = CONST.STRING
+        with mock.patch.object(Basic, 'access_token', autospec=True):
+            basic = Basic(app_id, CONST.STRING)
+        basic.token_store.set(app_id, 'stale', int(time.time()) + 7200)
+
+        def grant_access_token():
+            basic.token_store.set(app_id, 'fresh', int(time.time()) + 7200)
+
+        with mock.patch.object(basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.side_effect = [
+                {"errcode": 42001, "errmsg": "access_token expired"},
+                {"errcode": 0}
+            ]
+            with mock.patch.object(basic, '_grant_access_token',
+                                   side_effect=grant_access_token):
+                eq_(basic._send_request('get', CONST.STRING), {"errcode": 0})
+            params = mock_session.request.call_args[1]['params']
+            eq_(params, {"access_token": 'fresh'})
+
+    def test_send_request_retry(self):
+        '''Tests the _send_request method retries by the retry policy.'''
+        self.basic.retry_policy = RetryPolicy(max_attempts=3)
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.side_effect = [
+                {"errcode": -1, "errmsg": "system busy"}
+            ] * 3
+            with mock.patch('time.sleep') as mock_sleep:
+                with self.assertRaises(WechatError):
+                    self.basic._send_request(
+                        'get', CONST.STRING, params={"key": CONST.STRING})
+                eq_(mock_session.request.call_count, 3)
+                eq_(mock_sleep.call_count, 2)
+
+    def test_send_request_metrics(self):
+        '''Tests the _send_request method records the metrics.'''
+        self.basic.metrics = Metrics()
+        self.basic.retry_policy = RetryPolicy(max_attempts=3)
+        url = CONST.STRING
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.side_effect = [
+                {"errcode": -1, "errmsg": "system busy"}, {"errcode": 0}
+            ]
+            with mock.patch('time.sleep'):
+                self.basic._send_request(
+                    'get', url, params={"key": CONST.STRING})
+        url_metrics = self.basic.metrics.snapshot()["urls"][url]
+        eq_(url_metrics["calls"], 2)
+        eq_(url_metrics["retries"], 1)
+        eq_(url_metrics["errors"], {"-1": 1})
+
+    def test_send_request_metrics_rate_limit(self):
+        '''Tests the metrics leave out the waits of the rate limiter.'''
+        self.basic.metrics = Metrics()
+        waits = [0.1]
+
+        def acquire(app_id, url, timeout=None):
+            if not waits:
+                raise RateLimitError()
+            time.sleep(waits.pop())
+
+        self.basic.rate_limiter = mock.Mock()
+        self.basic.rate_limiter.acquire.side_effect = acquire
+        url = CONST.STRING
+        params = {"key": CONST.STRING}
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"errcode": 0}
+            self.basic._send_request('get', url, params=params)
+            with self.assertRaises(RateLimitError):
+                self.basic._send_request('get', url, params=params)
+        url_metrics = self.basic.metrics.snapshot()["urls"][url]
+        eq_(url_metrics["calls"], 1)
+        eq_(url_metrics["rate_limited"], 1)
+        eq_(url_metrics["errors"], {})
+        ok_(url_metrics["latency"]["sum"] < 0.1)
+
+    def test_send_request_cache(self):
+        '''Tests the _send_request method reads the response cache.'''
+        self.basic.response_cache = ResponseCache()
+        url = 'https://api.weixin.qq.com/card/getcolors'
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"colors": []}
+            params = {"key": CONST.STRING}
+            for _ in range(3):
+                data = self.basic._send_request('get', url, params=params)
+                eq_(data, {"colors": []})
+            eq_(mock_session.request.call_count, 1)
+
+        # the responses of another account are not shared.
+        basic = Basic(CONST.STRING, CONST.STRING,
+                      response_cache=self.basic.response_cache)
+        with mock.patch.object(basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"colors": []}
+            basic._send_request('get', url, params=params)
+            eq_(mock_session.request.call_count, 1)
+
+    def test_send_request_listeners(self):
+        '''Tests the _send_request method calls the response listeners.'''
+        listener = mock.Mock()
+        self.basic.response_listeners = [listener]
+        url = CONST.STRING
+        data = {"key": CONST.STRING}
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            response = mock_session.request.return_value
+            response.json.return_value = {"errcode": 0}
+            self.basic._send_request(
+                'post', url, params={"key": CONST.STRING}, data=data)
+            listener.assert_called_once_with(url, data, {"errcode": 0})
+
+            response.json.return_value = {"errcode": CONST.NUMBER}
+            with self.assertRaises(WechatError):
+                self.basic._send_request(
+                    'post', url, params={"key": CONST.STRING}, data=data)
+            eq_(listener.call_count, 1)
+
+    def test_send_request_validator(self):
+        '''Tests the _send_request method rejects the invalid data.'''
+        self.basic.validator = Validator()
+        with mock.patch.object(self.basic, 'session') as mock_session:
+            with self.assertRaises(ValidationError):
+                self.basic._send_request(
+                    'post', SHAKE_URL + 'device/applyid',
+                    data={"quantity": 500})
+            eq_(mock_session.request.call_count, 0)
+
     def test_grant_access_token(self):
         '''Tests the _grant_access_token method.'''
         with mock.patch.object(Basic, '_send_request') as mock_method:
@@ -72,6 +302,91 @@ class BasicTest(unittest.TestCase):
             data = self.basic._grant_access_token()
             eq_(data.get('access_token'), access_token)
             eq_(data.get('expires_in'), expires_in)
+            eq_(self.basic._load_access_token()[0], access_token)
+
+    def test_access_token_from_store(self):
+        '''Tests the access token is shared by the token store.'''
+        app_id = CONST.STRING
+        access_token = CONST.STRING
+        self.basic.token_store.set(
+            app_id, access_token, int(time.time()) + 7200)
+        with mock.patch.object(Basic, '_grant_access_token') as mock_method:
+            basic = Basic(app_id, CONST.STRING,
+                          token_store=self.basic.token_store)
+            eq_(basic.access_token, access_token)
+            eq_(mock_method.call_count, 0)
+
+    def test_access_token_in_memory(self):
+        '''Tests the access token is read from the token store once.'''
+        app_id = CONST.STRING
+        access_token = CONST.STRING
+        with mock.patch.object(Basic, 'access_token', autospec=True):
+            basic = Basic(app_id, CONST.STRING)
+        basic.token_store.set(app_id, access_token, int(time.time()) + 7200)
+        with mock.patch.object(basic.token_store, 'get',
+                               wraps=basic.token_store.get) as mock_method:
+            for _ in range(3):
+                eq_(basic.access_token, access_token)
+            eq_(mock_method.call_count, 1)
+            with mock.patch('time.time', return_value=time.time() + 60):
+                eq_(basic.access_token, access_token)
+            eq_(mock_method.call_count, 2)
+
+            basic.token_store.set(app_id, 'fresh', int(time.time()) + 7200)
+            with mock.patch.object(basic, '_grant_access_token') as mock_grant:
+                ok_(basic._refresh_access_token(access_token) is None)
+                eq_(mock_grant.call_count, 0)
+            eq_(basic.access_token, 'fresh')
+
+    def test_access_token_single_flight(self):
+        '''Tests the access token is granted once by concurrent threads.'''
+        app_id = CONST.STRING
+        access_token = CONST.STRING
+        with mock.patch.object(Basic, 'access_token', autospec=True):
+            basic = Basic(app_id, CONST.STRING)
+
+        def grant_access_token():
+            time.sleep(0.05)
+            basic.token_store.set(
+                app_id, access_token, int(time.time()) + 7200)
+
+        with mock.patch.object(basic, '_grant_access_token',
+                               side_effect=grant_access_token) as mock_method:
+            tokens = []
+            threads = [
+                threading.Thread(
+                    target=lambda: tokens.append(basic.access_token))
+                for _ in range(10)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            eq_(mock_method.call_count, 1)
+            eq_(tokens, [access_token] * 10)
+
+    def test_refresh_access_token(self):
+        '''Tests the _refresh_access_token method.'''
+        app_id = CONST.STRING
+        access_token = CONST.STRING
+        with mock.patch.object(Basic, 'access_token', autospec=True):
+            basic = Basic(app_id, CONST.STRING)
+        basic.token_store.set(app_id, access_token, int(time.time()) + 7200)
+        with mock.patch.object(basic, '_grant_access_token') as mock_method:
+            ok_(basic._refresh_access_token(CONST.STRING) is None)
+            eq_(mock_method.call_count, 0)
+            basic._refresh_access_token(access_token)
+            eq_(mock_method.call_count, 1)
+
+    def test_bulk(self):
+        '''Tests the bulk method.'''
+        with mock.patch.object(Basic,
+                               '_get_wechat_server_ips') as mock_method:
+            mock_method.side_effect = lambda: {"ip_list": []}
+            results = list(self.basic.bulk(
+                '_get_wechat_server_ips', [()] * 5, workers=2))
+            eq_(len(results), 5)
+            eq_(mock_method.call_count, 5)
 
     def test_get_wechat_server_ips(self):
         '''Tests the _get_wechat_server_ips method.'''
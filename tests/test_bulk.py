@@ -0,0 +1,79 @@
+#-*- coding: utf-8 -*-
+import time
+import random
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.bulk import BulkWindow, bulk_call, prefetch, split_args
+from pywechat.excepts import WechatError
+
+
+class BulkTest(unittest.TestCase):
+
+    '''Creates a TestCase for the bulk calls.'''
+
+    def test_split_args(self):
+        eq_(split_args((1, 2)), ((1, 2), {}))
+        eq_(split_args({"count": 1}), ((), {"count": 1}))
+        eq_(split_args([1, 2]), (([1, 2],), {}))
+
+    def test_bulk_window(self):
+        window = BulkWindow(2, ordered=True)
+        ok_(window.is_empty())
+        eq_([window.submit(), window.submit()], [0, 1])
+        ok_(not window.has_room())
+        eq_(window.finish(1, 'second'), [])
+        eq_(window.finish(0, 'first'), ['first', 'second'])
+        ok_(window.is_empty() and window.has_room())
+
+        window = BulkWindow(2)
+        window.submit()
+        window.submit()
+        eq_(window.finish(1, 'second'), ['second'])
+        ok_(window.has_room() and not window.is_empty())
+
+    def test_bulk_call_ordered(self):
+        def double(number):
+            time.sleep(random.random() / 100)
+            return number * 2
+
+        results = list(bulk_call(double, range(50), workers=4, ordered=True))
+        eq_([result.args for result in results], list(range(50)))
+        eq_([result.result for result in results],
+            [number * 2 for number in range(50)])
+
+    def test_bulk_call_errors(self):
+        errcode = CONST.NUMBER
+
+        def check(number):
+            if number % 2:
+                raise WechatError(errcode)
+            return number
+
+        results = list(bulk_call(check, range(10), workers=3))
+        eq_(len(results), 10)
+        errors = [result for result in results if result.error]
+        eq_(sorted(result.args for result in errors), [1, 3, 5, 7, 9])
+        ok_(all(result.error.code == errcode for result in errors))
+
+    def test_bulk_call_raises(self):
+        def fail(number):
+            raise ValueError(number)
+
+        with self.assertRaises(ValueError):
+            list(bulk_call(fail, range(10), workers=2))
+
+    def test_prefetch(self):
+        eq_(list(prefetch(range(10), size=2)), list(range(10)))
+        items = prefetch(iter(range(100)))
+        eq_(next(items), 0)
+        items.close()
+
+    def test_prefetch_raises(self):
+        def pages():
+            yield 1
+            raise WechatError(CONST.NUMBER)
+
+        with self.assertRaises(WechatError):
+            list(prefetch(pages()))
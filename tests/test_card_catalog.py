@@ -0,0 +1,113 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import mock
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.bulk import BulkResult
+from pywechat.card_catalog import CARD_URL, CardCatalog
+from pywechat.excepts import WechatError
+
+
+def make_card(title, quantity=100):
+    return {
+        "card_type": "GROUPON",
+        "groupon": {
+            "base_info": {
+                "title": title,
+                "color": "Color010",
+                "sku": {"quantity": quantity}
+            },
+            "deal_detail": CONST.STRING
+        }
+    }
+
+
+class CardCatalogTest(unittest.TestCase):
+
+    '''Creates a TestCase for the card catalog.'''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cards.json')
+        self.catalog = CardCatalog(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put(self):
+        card_id = CONST.STRING
+        card = make_card(CONST.STRING)
+        ok_(self.catalog.put(card_id, card))
+        ok_(not self.catalog.put(card_id, card))
+        eq_(self.catalog.get(card_id), card)
+        # the copy can not change the catalog.
+        self.catalog.get(card_id)["card_type"] = CONST.STRING
+        eq_(self.catalog.get(card_id), card)
+        ok_(self.catalog.remove(card_id))
+        ok_(self.catalog.get(card_id) is None)
+
+    def test_sync(self):
+        cards = dict((CONST.STRING, make_card(CONST.STRING)) for _ in range(3))
+        card_ids = sorted(cards)
+        self.catalog.put(CONST.STRING, make_card(CONST.STRING))
+        error = WechatError(CONST.NUMBER)
+        card_service = mock.Mock()
+        card_service.iter_cards.return_value = [
+            BulkResult(card_id, {"card": cards[card_id]}, None)
+            for card_id in card_ids[:2]
+        ] + [BulkResult(card_ids[2], None, error)]
+        report = self.catalog.sync(card_service)
+        eq_(sorted(report["changed"]), card_ids[:2])
+        eq_(len(report["removed"]), 1)
+        eq_(report["failures"], [(card_ids[2], error)])
+        eq_(sorted(self.catalog.card_ids()), card_ids[:2])
+
+        # the unchanged cards are skipped.
+        card_service.iter_cards.return_value = [
+            BulkResult(card_id, {"card": cards[card_id]}, None)
+            for card_id in card_ids[:2]
+        ]
+        report = self.catalog.sync(card_service)
+        eq_(report["changed"], [])
+
+        catalog = CardCatalog(self.path)
+        eq_(catalog.get(card_ids[0]), cards[card_ids[0]])
+
+    def test_update(self):
+        card_id = CONST.STRING
+        card = make_card(CONST.STRING)
+        self.catalog.update(
+            CARD_URL + 'create', {"card": card}, {"card_id": card_id})
+        eq_(self.catalog.get(card_id)["groupon"]["base_info"]["id"], card_id)
+
+        color = CONST.STRING
+        self.catalog.update(CARD_URL + 'update', {
+            "card_id": card_id,
+            "groupon": {
+                "base_info": {"color": color, "detail": None},
+                "bonus_rules": None
+            }
+        }, {"errcode": 0})
+        base_info = self.catalog.get(card_id)["groupon"]["base_info"]
+        eq_(base_info["color"], color)
+        ok_("detail" not in base_info)
+        ok_("bonus_rules" not in self.catalog.get(card_id)["groupon"])
+
+        self.catalog.update(CARD_URL + 'modifystock', {
+            "card_id": card_id, "increase_stock_value": 5
+        }, {"errcode": 0})
+        self.catalog.update(CARD_URL + 'modifystock', {
+            "card_id": card_id, "reduce_stock_value": 2
+        }, {"errcode": 0})
+        eq_(self.catalog.get(card_id)["groupon"]["base_info"]["sku"],
+            {"quantity": 103})
+        eq_(CardCatalog(self.path).get(card_id), self.catalog.get(card_id))
+
+        self.catalog.update(
+            CARD_URL + 'delete', {"card_id": card_id}, {"errcode": 0})
+        ok_(card_id not in self.catalog)
+        ok_(card_id not in CardCatalog(self.path))
@@ -0,0 +1,38 @@
+#-*- coding: utf-8 -*-
+import json
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.codec import JSONCodec, get_codec
+from pywechat.excepts import CodeBuildError
+
+
+class CodecTest(unittest.TestCase):
+
+    '''Creates a TestCase for the json codecs.'''
+
+    def setUp(self):
+        self.data = {
+            "title": u'摇一摇',
+            "page_ids": [CONST.NUMBER],
+            "comment": CONST.STRING
+        }
+
+    def test_json_codec(self):
+        codec = JSONCodec()
+        content = codec.dumps(self.data)
+        ok_(isinstance(content, bytes))
+        eq_(content, json.dumps(self.data).encode('utf-8'))
+        eq_(codec.loads(content), self.data)
+        eq_(codec.loads(content.decode('utf-8')), self.data)
+
+    def test_get_codec(self):
+        with self.assertRaises(CodeBuildError):
+            get_codec(CONST.STRING)
+        eq_(get_codec('json').name, 'json')
+        codec = get_codec('auto')
+        content = codec.dumps(self.data)
+        ok_(isinstance(content, bytes))
+        eq_(codec.loads(content), self.data)
+        eq_(json.loads(content.decode('utf-8')), self.data)
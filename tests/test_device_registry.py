@@ -0,0 +1,129 @@
+#-*- coding: utf-8 -*-
+import mock
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.device_registry import DEVICE_URL, DeviceRegistry
+
+
+def make_device(device_id, poi_id=0, page_ids=''):
+    return {
+        "comment": "",
+        "device_id": device_id,
+        "major": 10001,
+        "minor": device_id,
+        "page_ids": page_ids,
+        "status": 1,
+        "poi_id": poi_id,
+        "uuid": "FDA50693-A4E2-4FB1-AFCF-C6EB07647825"
+    }
+
+
+class DeviceRegistryTest(unittest.TestCase):
+
+    '''Creates a TestCase for the device registry.'''
+
+    def setUp(self):
+        self.registry = DeviceRegistry()
+        self.uuid = "FDA50693-A4E2-4FB1-AFCF-C6EB07647825"
+
+    def test_put(self):
+        poi_id = CONST.NUMBER
+        self.registry.put(make_device(1, poi_id, "15369,15370"))
+        self.registry.put(make_device(2, poi_id))
+        eq_(self.registry.get(1)["page_ids"], [15369, 15370])
+        eq_(self.registry.find(self.uuid, 10001, 2)["device_id"], 2)
+        eq_([device["device_id"]
+             for device in self.registry.find_by_poi(poi_id)], [1, 2])
+        ok_(self.registry.get(3) is None)
+
+        # the copy can not change the registry.
+        self.registry.get(1)["page_ids"].append(1)
+        eq_(self.registry.get(1)["page_ids"], [15369, 15370])
+
+        self.registry.put(make_device(1))
+        eq_(len(self.registry.find_by_poi(poi_id)), 1)
+        eq_(len(self.registry.find_by_poi(0)), 1)
+        self.registry.remove(2)
+        ok_(self.registry.find(self.uuid, 10001, 2) is None)
+        eq_(self.registry.find_by_poi(poi_id), [])
+
+    def test_sync(self):
+        shake_service = mock.Mock()
+        shake_service.iter_devices.return_value = iter(
+            [make_device(1), make_device(2)])
+        self.registry.put(make_device(3))
+        self.registry.sync(shake_service)
+        eq_(len(self.registry), 2)
+        ok_(self.registry.get(3) is None)
+
+        shake_service.iter_devices.return_value = iter([make_device(4)])
+        self.registry.sync(shake_service, apply_id=CONST.NUMBER)
+        eq_(len(self.registry), 3)
+
+    def test_refresh(self):
+        device = make_device(1, page_ids="1")
+        shake_service = mock.Mock()
+        shake_service.search_devices_by_identifiers.return_value = {
+            1: device, (self.uuid, 10001, 1): device
+        }
+        self.registry.refresh(shake_service, device_ids=[1])
+        eq_(self.registry.get(1)["page_ids"], [1])
+
+    def test_update(self):
+        self.registry.put(make_device(1, page_ids="1,2"))
+        comment = CONST.STRING
+        poi_id = CONST.NUMBER
+        self.registry.update(DEVICE_URL + 'update', {
+            "comment": comment,
+            "device_identifier": {"device_id": 1}
+        }, {"data": {}})
+        eq_(self.registry.get(1)["comment"], comment)
+
+        self.registry.update(DEVICE_URL + 'bindlocation', {
+            "poi_id": poi_id,
+            "device_identifier": {
+                "uuid": self.uuid, "major": 10001, "minor": 1
+            }
+        }, {"data": {}})
+        eq_(self.registry.find_by_poi(poi_id)[0]["device_id"], 1)
+
+        bind_page = DEVICE_URL + 'bindpage'
+        identifier = {"device_id": 1}
+        self.registry.update(bind_page, {
+            "page_ids": [2, 3], "bind": 1, "append": 1,
+            "device_identifier": identifier
+        }, {"data": {}})
+        eq_(self.registry.get(1)["page_ids"], [1, 2, 3])
+        self.registry.update(bind_page, {
+            "page_ids": [1], "bind": 0, "append": 0,
+            "device_identifier": identifier
+        }, {"data": {}})
+        eq_(self.registry.get(1)["page_ids"], [2, 3])
+        self.registry.update(bind_page, {
+            "page_ids": [4], "bind": 1, "append": 0,
+            "device_identifier": identifier
+        }, {"data": {}})
+        eq_(self.registry.get(1)["page_ids"], [4])
+
+    def test_update_search_and_apply(self):
+        self.registry.update(DEVICE_URL + 'search', {"begin": 0}, {
+            "data": {"devices": [make_device(1)], "total_count": 1}
+        })
+        eq_(len(self.registry), 1)
+        comment = CONST.STRING
+        self.registry.update(DEVICE_URL + 'applyid', {
+            "quantity": 1, "comment": comment
+        }, {
+            "data": {
+                "apply_id": 123,
+                "device_identifiers": [{
+                    "device_id": 2, "uuid": self.uuid,
+                    "major": 10001, "minor": 2
+                }]
+            }
+        })
+        eq_(self.registry.find(self.uuid, 10001, 2)["comment"], comment)
+        self.registry.update(CONST.STRING, {}, {"data": {}})
+        eq_(len(self.registry), 2)
@@ -0,0 +1,30 @@
+#-*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import eq_
+from .constants import CONST
+
+from pywechat.json_file import dump_json
+
+
+class JSONFileTest(unittest.TestCase):
+
+    '''Creates a TestCase for the atomic writes of json files.'''
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_dump_json(self):
+        path = os.path.join(self.path, 'data.json')
+        data = {"key": CONST.STRING}
+        dump_json(data, path)
+        dump_json(data, path)
+        with open(path) as json_file:
+            eq_(json.load(json_file), data)
+        eq_(os.listdir(self.path), ['data.json'])
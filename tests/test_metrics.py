@@ -0,0 +1,64 @@
+#-*- coding: utf-8 -*-
+import mock
+import unittest
+import requests
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.excepts import WechatError
+from pywechat.metrics import Metrics, get_error_code
+
+
+class MetricsTest(unittest.TestCase):
+
+    '''Creates a TestCase for the metrics of requests.'''
+
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1))
+
+    def test_get_error_code(self):
+        errcode = CONST.NUMBER
+        eq_(get_error_code(WechatError(errcode)), str(errcode))
+        response = mock.Mock(status_code=502)
+        eq_(get_error_code(requests.HTTPError(response=response)),
+            'http_502')
+        eq_(get_error_code(requests.ConnectionError()), 'ConnectionError')
+
+    def test_snapshot(self):
+        url = CONST.STRING
+        self.metrics.observe(url, 0.05)
+        self.metrics.observe(url, 0.5, WechatError(-1))
+        self.metrics.observe(url, 3)
+        self.metrics.count_retry(url)
+        self.metrics.count_rate_limited(url)
+        self.metrics.count_token_refresh()
+        snapshot = self.metrics.snapshot()
+        eq_(snapshot["token_refreshes"], 1)
+        url_metrics = snapshot["urls"][url]
+        eq_(url_metrics["calls"], 3)
+        eq_(url_metrics["retries"], 1)
+        eq_(url_metrics["rate_limited"], 1)
+        eq_(url_metrics["errors"], {"-1": 1})
+        eq_(url_metrics["latency"]["count"], 3)
+        eq_(url_metrics["latency"]["buckets"], [(0.1, 1), (1, 2)])
+
+        self.metrics.reset()
+        eq_(self.metrics.snapshot(), {"token_refreshes": 0, "urls": {}})
+
+    def test_to_prometheus(self):
+        url = 'https://api.weixin.qq.com/card/get'
+        self.metrics.observe(url, 0.05)
+        self.metrics.observe(url, 0.5, WechatError(40001))
+        self.metrics.count_rate_limited(url)
+        text = self.metrics.to_prometheus()
+        ok_('# TYPE pywechat_requests_total counter\n' in text)
+        ok_('pywechat_requests_total{{url="{0}"}} 2\n'.format(url) in text)
+        ok_('pywechat_request_errors_total{{url="{0}",errcode="40001"}} 1\n'
+            .format(url) in text)
+        bucket = 'pywechat_request_duration_seconds_bucket'
+        ok_('{0}{{url="{1}",le="0.1"}} 1\n'.format(bucket, url) in text)
+        ok_('{0}{{url="{1}",le="+Inf"}} 2\n'.format(bucket, url) in text)
+        ok_('pywechat_rate_limited_total{{url="{0}"}} 1\n'
+            .format(url) in text)
+        ok_('pywechat_token_refreshes_total 0\n' in text)
+        eq_(Metrics._format_labels([('url', 'a"b')]), '{url="a\\"b"}')
@@ -0,0 +1,60 @@
+#-*- coding: utf-8 -*-
+import time
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.excepts import RateLimitError, WechatError
+from pywechat.rate_limit import RateLimiter, TokenBucket
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    '''Creates a TestCase for the rate limiter.'''
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(10, 2)
+        eq_(bucket.get_wait(), 0)
+        bucket.tokens = 0.5
+        ok_(abs(bucket.get_wait() - 0.05) < 1e-9)
+        bucket.fill(bucket.updated_at + 10)
+        eq_(bucket.tokens, 2)
+
+    def test_slow_rate(self):
+        # a daily quota of 10000 requests.
+        limiter = RateLimiter(per_app=(10000 / 86400.,))
+        app_id = CONST.STRING
+        url = CONST.STRING
+        eq_(limiter.try_acquire(app_id, url), 0)
+        wait = limiter.try_acquire(app_id, url)
+        ok_(8.6 < wait <= 8.64)
+
+    def test_per_url(self):
+        url = CONST.STRING
+        limiter = RateLimiter(per_url={url: (1, 2)})
+        app_id = CONST.STRING
+        eq_(limiter.try_acquire(app_id, url), 0)
+        eq_(limiter.try_acquire(app_id, url), 0)
+        ok_(limiter.try_acquire(app_id, url) > 0)
+        # the other urls and apps are not limited.
+        eq_(limiter.try_acquire(app_id, CONST.STRING), 0)
+        eq_(limiter.try_acquire(CONST.STRING, url), 0)
+
+    def test_per_app(self):
+        app_id = CONST.STRING
+        limiter = RateLimiter(per_app=(1, 1))
+        eq_(limiter.try_acquire(app_id, CONST.STRING), 0)
+        ok_(limiter.try_acquire(app_id, CONST.STRING) > 0)
+
+    def test_acquire(self):
+        app_id = CONST.STRING
+        url = CONST.STRING
+        limiter = RateLimiter(default=(50, 1))
+        limiter.acquire(app_id, url)
+        started_at = time.time()
+        limiter.acquire(app_id, url)
+        ok_(time.time() - started_at > 0.01)
+        with self.assertRaises(RateLimitError) as e:
+            limiter.acquire(app_id, url, timeout=0)
+        ok_(isinstance(e.exception, WechatError))
+        eq_(e.exception.code, 45009)
@@ -0,0 +1,75 @@
+#-*- coding: utf-8 -*-
+import time
+import mock
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.response_cache import ResponseCache
+
+GET_CARD_URL = 'https://api.weixin.qq.com/card/get'
+UPDATE_CARD_URL = 'https://api.weixin.qq.com/card/update'
+SEARCH_PAGE_URL = 'https://api.weixin.qq.com/shakearound/page/search'
+DELETE_PAGE_URL = 'https://api.weixin.qq.com/shakearound/page/delete'
+APP_ID = 'app_id'
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    '''Creates a TestCase for the response cache.'''
+
+    def setUp(self):
+        self.cache = ResponseCache(max_entries=2)
+
+    def test_get(self):
+        card_id = CONST.STRING
+        data = {"card_id": card_id}
+        json_data = {"card": {"card_id": card_id}}
+        ok_(self.cache.get(APP_ID, GET_CARD_URL, data) is None)
+        self.cache.update(APP_ID, GET_CARD_URL, data, json_data)
+        eq_(self.cache.get(APP_ID, GET_CARD_URL, {"card_id": card_id}),
+            json_data)
+        # the cached json data can not be changed by the caller.
+        self.cache.get(APP_ID, GET_CARD_URL, data)["card"] = None
+        eq_(self.cache.get(APP_ID, GET_CARD_URL, data), json_data)
+
+    def test_uncached_url(self):
+        url = CONST.STRING
+        self.cache.update(APP_ID, url, None, {})
+        ok_(self.cache.get(APP_ID, url) is None)
+        eq_(len(self.cache), 0)
+
+    def test_expired(self):
+        data = {"card_id": CONST.STRING}
+        self.cache.update(APP_ID, GET_CARD_URL, data, {})
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            ok_(self.cache.get(APP_ID, GET_CARD_URL, data) is None)
+
+    def test_lru(self):
+        for card_id in range(3):
+            self.cache.update(APP_ID, GET_CARD_URL, {"card_id": card_id}, {})
+        eq_(len(self.cache), 2)
+        ok_(self.cache.get(APP_ID, GET_CARD_URL, {"card_id": 0}) is None)
+        ok_(self.cache.get(APP_ID, GET_CARD_URL, {"card_id": 2}) is not None)
+
+    def test_invalidations(self):
+        card_id = CONST.STRING
+        self.cache.update(APP_ID, GET_CARD_URL, {"card_id": card_id}, {})
+        self.cache.update(APP_ID, SEARCH_PAGE_URL, {"page_ids": [1]}, {})
+        self.cache.update(APP_ID, UPDATE_CARD_URL, {"card_id": card_id}, {})
+        ok_(self.cache.get(APP_ID, GET_CARD_URL, {"card_id": card_id}) is None)
+        ok_(self.cache.get(
+            APP_ID, SEARCH_PAGE_URL, {"page_ids": [1]}) is not None)
+        self.cache.update(APP_ID, DELETE_PAGE_URL, {"page_ids": [2]}, {})
+        eq_(len(self.cache), 0)
+
+    def test_apps(self):
+        data = {"card_id": CONST.STRING}
+        other_app_id = APP_ID + CONST.STRING
+        self.cache.update(APP_ID, GET_CARD_URL, data, {})
+        ok_(self.cache.get(other_app_id, GET_CARD_URL, data) is None)
+        self.cache.update(other_app_id, GET_CARD_URL, data, {"card": None})
+        eq_(self.cache.get(APP_ID, GET_CARD_URL, data), {})
+        self.cache.update(other_app_id, UPDATE_CARD_URL, data, {})
+        ok_(self.cache.get(other_app_id, GET_CARD_URL, data) is None)
+        eq_(self.cache.get(APP_ID, GET_CARD_URL, data), {})
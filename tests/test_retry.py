@@ -0,0 +1,55 @@
+#-*- coding: utf-8 -*-
+import mock
+import requests
+import unittest
+from nose.tools import ok_
+from .constants import CONST
+
+from pywechat.excepts import WechatError
+from pywechat.retry import NewConnectionError, RetryPolicy, is_token_invalid
+
+CREATE_CARD_URL = 'https://api.weixin.qq.com/card/create'
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    '''Creates a TestCase for the retry policy.'''
+
+    def setUp(self):
+        self.policy = RetryPolicy(base_delay=1, max_delay=3)
+
+    def test_is_retryable(self):
+        ok_(self.policy.is_retryable(WechatError(-1)))
+        ok_(not self.policy.is_retryable(WechatError(40013)))
+        ok_(self.policy.is_retryable(requests.ConnectionError()))
+        response = mock.Mock(status_code=503)
+        ok_(self.policy.is_retryable(requests.HTTPError(response=response)))
+        response = mock.Mock(status_code=404)
+        ok_(not self.policy.is_retryable(
+            requests.HTTPError(response=response)))
+        ok_(not self.policy.is_retryable(ValueError()))
+
+    def test_is_retryable_non_idempotent(self):
+        response = mock.Mock(status_code=503)
+        for error in [requests.HTTPError(response=response),
+                      requests.exceptions.ReadTimeout(),
+                      requests.ConnectionError()]:
+            ok_(self.policy.is_retryable(error, CONST.STRING))
+            ok_(not self.policy.is_retryable(error, CREATE_CARD_URL))
+        ok_(self.policy.is_retryable(WechatError(-1), CREATE_CARD_URL))
+        ok_(self.policy.is_retryable(
+            requests.exceptions.ConnectTimeout(), CREATE_CARD_URL))
+        if NewConnectionError is None:
+            return
+        reason = NewConnectionError(None, CONST.STRING)
+        ok_(self.policy.is_retryable(
+            requests.ConnectionError(mock.Mock(reason=reason)),
+            CREATE_CARD_URL))
+
+    def test_get_delay(self):
+        ok_(0 <= self.policy.get_delay(1) <= 1)
+        ok_(0 <= self.policy.get_delay(10) <= 3)
+
+    def test_is_token_invalid(self):
+        ok_(is_token_invalid(WechatError(42001)))
+        ok_(not is_token_invalid(WechatError(CONST.NUMBER + 50000)))
@@ -1,4 +1,5 @@
 #-*- coding: utf-8 -*-
+import io
 import json
 import mock
 import unittest
@@ -52,6 +53,28 @@ class CardServiceTest(TestCase):
             data = self.card_service.upload_image(image)
             eq_(data["url"], pic_url)
 
+    def test_upload_image_once(self):
+        pic_url = CONST.STRING
+        self.card_service.upload_index = mock.Mock()
+        self.card_service.upload_index.get.return_value = None
+        with mock.patch.object(CardService, '_send_request') as mock_method:
+            mock_method.return_value = {
+                "url": pic_url
+            }
+            data = self.card_service.upload_image_once(
+                io.BytesIO(b'image'), 'logo.png')
+            eq_(data["url"], pic_url)
+            headers = mock_method.call_args[1]['headers']
+            ok_(headers["Content-Type"].startswith('multipart/form-data'))
+            digest = self.card_service.upload_index.get.call_args[0][1]
+            self.card_service.upload_index.set.assert_called_once_with(
+                'card_image', digest, pic_url)
+
+            self.card_service.upload_index.get.return_value = pic_url
+            data = self.card_service.upload_image_once(io.BytesIO(b'image'))
+            eq_(data, {"url": pic_url})
+            eq_(mock_method.call_count, 1)
+
     def test_unavilable_code(self):
         code = CONST.STRING
         card_id = CONST.STRING
@@ -124,6 +147,37 @@ class CardServiceTest(TestCase):
             eq_(data["card_id_list"][0], card_id)
             eq_(data["total_num"], 1)
 
+    def test_iter_card_ids(self):
+        card_ids = [CONST.STRING for _ in range(7)]
+
+        def batchget_card(offset, count):
+            return {
+                "errcode": 0,
+                "errmsg": "ok",
+                "card_id_list": card_ids[offset:offset + count],
+                "total_num": len(card_ids)
+            }
+
+        with mock.patch.object(CardService, 'batchget_card',
+                               side_effect=batchget_card) as mock_method:
+            eq_(list(self.card_service.iter_card_ids(3)), card_ids)
+            eq_(mock_method.call_count, 3)
+
+    def test_iter_cards(self):
+        card_ids = [CONST.STRING for _ in range(5)]
+        with mock.patch.object(CardService, 'batchget_card') as mock_method:
+            mock_method.return_value = {
+                "errcode": 0,
+                "errmsg": "ok",
+                "card_id_list": card_ids,
+                "total_num": len(card_ids)
+            }
+            with mock.patch.object(CardService, 'get_card') as get_card:
+                get_card.side_effect = lambda card_id: {"card": card_id}
+                results = list(self.card_service.iter_cards(workers=2))
+                eq_([result.args for result in results], card_ids)
+                eq_([result.result["card"] for result in results], card_ids)
+
     def test_modify_stock(self):
         card_id = CONST.STRING
         increase_stock_value = CONST.NUMBER
@@ -1,13 +1,19 @@
 #-*- coding: utf-8 -*-
 import json
+import os
+import shutil
+import tempfile
+import time
 import mock
 import unittest
 from nose.tools import eq_, ok_
 from ..constants import CONST
 from ..test_base import TestCase
 
+from pywechat.excepts import WechatError
 from pywechat.services.basic import Basic
-from pywechat.services.wechat_shake import ShakeService
+from pywechat.services.wechat_shake import ShakeService, ONE_DAY
+from pywechat.statistics_cache import StatisticsCache, get_ftime
 
 
 class ShakeServiceTest(TestCase):
@@ -126,6 +132,43 @@ class ShakeServiceTest(TestCase):
             eq_(data["data"]["devices"][0]["major"], major)
             eq_(data["data"]["devices"][0]["minor"], minor)
 
+    def test_search_devices_by_identifiers(self):
+        uuid = CONST.STRING
+        devices = [
+            {
+                "device_id": device_id,
+                "uuid": uuid,
+                "major": 1,
+                "minor": device_id
+            }
+            for device_id in range(120)
+        ]
+
+        def search_device_identifiers(device_identifiers):
+            ok_(len(device_identifiers) <= 50)
+            return {
+                "data": {
+                    "devices": [
+                        devices[identifier.get("device_id",
+                                               identifier.get("minor"))]
+                        for identifier in device_identifiers
+                    ],
+                    "total_count": len(device_identifiers)
+                },
+                "errcode": 0,
+                "errmsg": "success."
+            }
+
+        with mock.patch.object(ShakeService, '_search_device_identifiers',
+                               side_effect=search_device_identifiers) \
+                as mock_method:
+            data = self.shake_service.search_devices_by_identifiers(
+                device_ids=range(100), uuids=[(uuid, 1, 110)])
+            eq_(mock_method.call_count, 3)
+            eq_(data[99], devices[99])
+            eq_(data[(uuid, 1, 110)], devices[110])
+            eq_(data[(uuid, 1, 5)], devices[5])
+
     def test_search_devices(self):
         apply_id = CONST.NUMBER
         device_id = CONST.NUMBER
@@ -159,6 +202,27 @@ class ShakeServiceTest(TestCase):
             eq_(data["data"]["devices"][0]["minor"], minor)
             eq_(data["data"]["total_count"], 1)
 
+    def test_iter_devices(self):
+        apply_id = CONST.NUMBER
+        devices = [{"device_id": device_id} for device_id in range(23)]
+
+        def search_devices(begin, count, apply_id=None):
+            return {
+                "data": {
+                    "devices": devices[begin:begin + count],
+                    "total_count": len(devices)
+                },
+                "errcode": 0,
+                "errmsg": "success."
+            }
+
+        with mock.patch.object(ShakeService, 'search_devices',
+                               side_effect=search_devices) as mock_method:
+            data = list(self.shake_service.iter_devices(apply_id, count=5))
+            eq_(data, devices)
+            eq_(mock_method.call_count, 5)
+            mock_method.assert_any_call(20, 5, apply_id)
+
     def test_upload_material(self):
         image = CONST.STRING
         pic_url = CONST.STRING
@@ -249,6 +313,46 @@ class ShakeServiceTest(TestCase):
             eq_(data["data"]["total_count"], 1)
             eq_(data["data"]["pages"][0], page_data)
 
+    def test_search_pages_in_chunks(self):
+        page_ids = list(range(120))
+        errcode = CONST.NUMBER
+
+        def search_page_by_ids(page_ids):
+            if 100 in page_ids:
+                raise WechatError(errcode)
+            return {
+                "data": {
+                    "pages": [{"page_id": page_id} for page_id in page_ids],
+                    "total_count": len(page_ids)
+                },
+                "errcode": 0,
+                "errmsg": "success."
+            }
+
+        with mock.patch.object(ShakeService, 'search_page_by_ids',
+                               side_effect=search_page_by_ids):
+            data = self.shake_service.search_pages_in_chunks(page_ids)
+            eq_(sorted(page["page_id"] for page in data["pages"]),
+                list(range(100)))
+            eq_(len(data["failures"]), 1)
+            eq_(data["failures"][0][0], list(range(100, 120)))
+            eq_(data["failures"][0][1].code, errcode)
+
+    def test_delete_pages_in_chunks(self):
+        page_ids = list(range(60))
+        with mock.patch.object(ShakeService, 'delete_page') as mock_method:
+            mock_method.return_value = {
+                "data": {
+                },
+                "errcode": 0,
+                "errmsg": "success."
+            }
+            data = self.shake_service.delete_pages_in_chunks(
+                page_ids, chunk_size=25)
+            eq_(sorted(data["page_ids"]), page_ids)
+            eq_(data["failures"], [])
+            eq_(mock_method.call_count, 3)
+
     def test_search_page_by_counts(self):
         title = CONST.STRING
         description = CONST.STRING
@@ -318,6 +422,38 @@ class ShakeServiceTest(TestCase):
             data = self.shake_service.bind_location(page_ids)
             self.assertIsNotNone(data)
 
+    def test_bind_pages_in_bulk(self):
+        page_ids = [CONST.NUMBER]
+        device_uuid = (CONST.STRING, CONST.NUMBER, CONST.NUMBER)
+        bindings = {10011: page_ids, 10012: page_ids, device_uuid: page_ids}
+        errcode = CONST.NUMBER
+        failing = set([10012])
+
+        def bind_page(page_ids, bind, append, device_id=None, uuid=None,
+                      major=None, minor=None):
+            if device_id in failing:
+                raise WechatError(errcode)
+            return {"data": {}, "errcode": 0, "errmsg": "success."}
+
+        with mock.patch.object(ShakeService, 'bind_page',
+                               side_effect=bind_page) as mock_method:
+            report = self.shake_service.bind_pages_in_bulk(bindings)
+            eq_(set(report), set(bindings))
+            ok_(report[10011] is None)
+            ok_(report[device_uuid] is None)
+            eq_(report[10012].code, errcode)
+            mock_method.assert_any_call(
+                page_ids=page_ids, bind=1, append=0, uuid=device_uuid[0],
+                major=device_uuid[1], minor=device_uuid[2])
+
+            failing.clear()
+            mock_method.reset_mock()
+            report = self.shake_service.bind_pages_in_bulk(
+                bindings, report=report)
+            eq_(report, dict((key, None) for key in bindings))
+            mock_method.assert_called_once_with(
+                page_ids=page_ids, bind=1, append=0, device_id=10012)
+
     def test_get_shake_info(self):
         ticket = CONST.NUMBER
         need_poi = 1
@@ -394,3 +530,79 @@ class ShakeServiceTest(TestCase):
                 "shake_uv": 0
             }
             eq_(data["data"][0], statistics)
+
+    def test_device_statistics_range(self):
+        begin_date = 1425052800
+        end_date = begin_date + 99 * ONE_DAY
+        device_id = CONST.NUMBER
+
+        def device_statistics(begin, end, *device_identifier):
+            ok_(end - begin < 30 * ONE_DAY)
+            # the windows overlap the neighbours by a day.
+            return {
+                "data": [
+                    {"ftime": ftime, "shake_pv": 1}
+                    for ftime in range(begin - ONE_DAY,
+                                       end + 2 * ONE_DAY, ONE_DAY)
+                    if begin_date <= ftime <= end_date
+                ],
+                "errcode": 0,
+                "errmsg": "success."
+            }
+
+        with mock.patch.object(ShakeService, 'device_statistics',
+                               side_effect=device_statistics) as mock_method:
+            data = self.shake_service.device_statistics_range(
+                begin_date, end_date, device_id)
+            eq_(mock_method.call_count, 4)
+            eq_([item["ftime"] for item in data],
+                list(range(begin_date, end_date + 1, ONE_DAY)))
+
+    def test_page_statistics_range(self):
+        begin_date = 1425052800
+        page_id = CONST.NUMBER
+        with mock.patch.object(ShakeService, 'page_statistics') as mock_method:
+            mock_method.return_value = {
+                "data": [],
+                "errcode": 0,
+                "errmsg": "success."
+            }
+            data = self.shake_service.page_statistics_range(
+                page_id, begin_date, begin_date + 29 * ONE_DAY)
+            eq_(data, [])
+            mock_method.assert_called_once_with(
+                page_id, begin_date, begin_date + 29 * ONE_DAY)
+
+    def test_statistics_range_with_cache(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.shake_service.statistics_cache = StatisticsCache(
+            os.path.join(path, 'stats.db'))
+        self.addCleanup(setattr, self.shake_service, 'statistics_cache', None)
+        today = get_ftime(int(time.time()))
+        begin_date = today - 59 * ONE_DAY
+        page_id = CONST.NUMBER
+
+        def page_statistics(page_id, begin, end):
+            return {
+                "data": [
+                    {"ftime": ftime, "shake_pv": 1}
+                    for ftime in range(begin, end + 1, ONE_DAY)
+                ],
+                "errcode": 0,
+                "errmsg": "success."
+            }
+
+        with mock.patch.object(ShakeService, 'page_statistics',
+                               side_effect=page_statistics) as mock_method:
+            data = self.shake_service.page_statistics_range(
+                page_id, begin_date, today)
+            eq_(len(data), 60)
+            eq_(mock_method.call_count, 2)
+            data = self.shake_service.page_statistics_range(
+                page_id, begin_date, today)
+            eq_(len(data), 60)
+            eq_(mock_method.call_count, 3)
+            begin, end = mock_method.call_args[0][1:]
+            ok_(begin >= today - 2 * ONE_DAY)
+            eq_(end, today)
@@ -0,0 +1,105 @@
+#-*- coding: utf-8 -*-
+import threading
+import time
+import mock
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.device_registry import DeviceRegistry
+from pywechat.excepts import WechatError
+from pywechat.shake_ticket import PAGE_URL, ShakeTicketResolver
+
+
+class ShakeTicketResolverTest(unittest.TestCase):
+
+    '''Creates a TestCase for the resolver of the tickets of shaking.'''
+
+    def setUp(self):
+        self.shake_service = mock.Mock()
+        self.registry = DeviceRegistry()
+        self.resolver = ShakeTicketResolver(
+            self.shake_service, device_registry=self.registry)
+        self.uuid = "FDA50693-A4E2-4FB1-AFCF-C6EB07647825"
+        self.json_data = {
+            "data": {
+                "page_id": 14211,
+                "beacon_info": {
+                    "distance": 55.0,
+                    "major": 10001,
+                    "minor": 19007,
+                    "uuid": self.uuid
+                },
+                "openid": CONST.STRING,
+                "poi_id": 1234
+            },
+            "errcode": 0,
+            "errmsg": "success."
+        }
+
+    def test_resolve_cached(self):
+        ticket = CONST.STRING
+        self.shake_service.get_shake_info.return_value = self.json_data
+        eq_(self.resolver.resolve(ticket), self.json_data)
+        eq_(self.resolver.resolve(ticket), self.json_data)
+        eq_(self.shake_service.get_shake_info.call_count, 1)
+
+        self.resolver.ttl = 0
+        self.resolver.resolve(CONST.STRING)
+        self.resolver.resolve(CONST.STRING)
+        eq_(self.shake_service.get_shake_info.call_count, 3)
+
+    def test_resolve_single_flight(self):
+        ticket = CONST.STRING
+        started = threading.Event()
+
+        def get_shake_info(ticket, need_poi):
+            started.set()
+            time.sleep(0.05)
+            return self.json_data
+
+        self.shake_service.get_shake_info.side_effect = get_shake_info
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.resolver.resolve(ticket)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        eq_(results, [self.json_data] * 5)
+        eq_(self.shake_service.get_shake_info.call_count, 1)
+
+    def test_resolve_error(self):
+        ticket = CONST.STRING
+        self.shake_service.get_shake_info.side_effect = [
+            WechatError(CONST.NUMBER), self.json_data]
+        with self.assertRaises(WechatError):
+            self.resolver.resolve(ticket)
+        eq_(self.resolver.resolve(ticket), self.json_data)
+
+    def test_enrich(self):
+        self.registry.put({
+            "comment": "",
+            "device_id": 10097,
+            "major": 10001,
+            "minor": 19007,
+            "page_ids": "14211",
+            "status": 1,
+            "poi_id": 1234,
+            "uuid": self.uuid
+        })
+        page = {"page_id": 14211, "title": CONST.STRING}
+        self.resolver.update(PAGE_URL + 'search', {"page_ids": [14211]}, {
+            "data": {"pages": [page], "total_count": 1}
+        })
+        self.shake_service.get_shake_info.return_value = self.json_data
+        data = self.resolver.resolve(CONST.STRING)["data"]
+        eq_(data["device"]["device_id"], 10097)
+        eq_(data["page"], page)
+
+        self.resolver.update(
+            PAGE_URL + 'delete', {"page_ids": [14211]}, {"data": {}})
+        ok_("page" not in self.resolver.resolve(CONST.STRING)["data"])
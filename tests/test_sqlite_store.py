@@ -0,0 +1,38 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from nose.tools import eq_, ok_
+
+from pywechat.sqlite_store import SQLiteStore
+
+
+class _NameStore(SQLiteStore):
+
+    schema = 'CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY)'
+
+
+class SQLiteStoreTest(unittest.TestCase):
+
+    '''Creates a TestCase for the basic class of the SQLite stores.'''
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = _NameStore(os.path.join(self.path, 'names.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_connect(self):
+        conn = self.store._connect()
+        ok_(self.store._connect() is conn)
+        eq_(conn.execute('SELECT COUNT(*) FROM names').fetchone(), (0,))
+
+        conns = []
+        thread = threading.Thread(
+            target=lambda: conns.append(self.store._connect()))
+        thread.start()
+        thread.join()
+        ok_(conns[0] is not conn)
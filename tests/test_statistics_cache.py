@@ -0,0 +1,71 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.statistics_cache import StatisticsCache, ONE_DAY, get_ftime
+
+BEGIN_DATE = 1425052800
+
+
+class StatisticsCacheTest(unittest.TestCase):
+
+    '''Creates a TestCase for the cache of statistics.'''
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = StatisticsCache(os.path.join(self.path, 'stats.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_lookup_empty(self):
+        end_date = BEGIN_DATE + 9 * ONE_DAY
+        items, spans = self.cache.lookup(
+            'device', CONST.NUMBER, BEGIN_DATE, end_date)
+        eq_(items, {})
+        eq_(spans, [(BEGIN_DATE, end_date)])
+
+    def test_save_closed_days(self):
+        target = CONST.NUMBER
+        end_date = BEGIN_DATE + 9 * ONE_DAY
+        # the last two days are not closed yet.
+        now = BEGIN_DATE + 8 * ONE_DAY + self.cache.closed_delay
+        items = {
+            BEGIN_DATE + i * ONE_DAY: {"ftime": BEGIN_DATE + i * ONE_DAY}
+            for i in range(10) if i != 3
+        }
+        self.cache.save('device', target, [(BEGIN_DATE, end_date)],
+                        items, now=now)
+        cached, spans = self.cache.lookup(
+            'device', target, BEGIN_DATE, end_date, now=now)
+        eq_(sorted(cached),
+            [BEGIN_DATE + i * ONE_DAY for i in range(8) if i != 3])
+        eq_(spans, [(BEGIN_DATE + 8 * ONE_DAY, end_date)])
+        cached, spans = self.cache.lookup(
+            'page', target, BEGIN_DATE, end_date, now=now)
+        eq_(cached, {})
+
+    def test_unaligned_dates(self):
+        target = CONST.NUMBER
+        # the midnight of UTC is 8 hours after the ftime of the day.
+        begin_date = BEGIN_DATE + 8 * 60 * 60
+        end_date = begin_date + 4 * ONE_DAY
+        eq_(get_ftime(begin_date), BEGIN_DATE)
+        now = end_date + 2 * ONE_DAY + self.cache.closed_delay
+        cached, spans = self.cache.lookup(
+            'device', target, begin_date, end_date, now=now)
+        eq_(spans, [(BEGIN_DATE, BEGIN_DATE + 4 * ONE_DAY)])
+        items = dict(
+            (BEGIN_DATE + i * ONE_DAY, {"ftime": BEGIN_DATE + i * ONE_DAY})
+            for i in range(5)
+        )
+        self.cache.save('device', target, [(begin_date, end_date)],
+                        items, now=now)
+        cached, spans = self.cache.lookup(
+            'device', target, begin_date, end_date, now=now)
+        eq_(cached, items)
+        eq_(spans, [])
@@ -0,0 +1,43 @@
+#-*- coding: utf-8 -*-
+import time
+import mock
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.excepts import WechatError
+from pywechat.token_renewer import TokenRenewer
+
+
+class TokenRenewerTest(unittest.TestCase):
+
+    '''Creates a TestCase for the token renewer.'''
+
+    def setUp(self):
+        self.service = mock.Mock()
+        self.renewer = TokenRenewer(self.service, ratio=0.5, lifetime=7200)
+
+    def test_renew_not_due(self):
+        self.service._load_access_token.return_value = (
+            CONST.STRING, time.time() + 7000)
+        delay = self.renewer.renew()
+        ok_(3000 < delay <= 3400)
+        eq_(self.service._refresh_access_token.call_count, 0)
+
+    def test_renew_due(self):
+        access_token = CONST.STRING
+        self.service._load_access_token.return_value = (
+            access_token, time.time() + 3000)
+        self.service._refresh_access_token.return_value = {
+            "access_token": CONST.STRING,
+            "expires_in": 3600
+        }
+        eq_(self.renewer.renew(), 0)
+        self.service._refresh_access_token.assert_called_once_with(
+            access_token)
+        eq_(self.renewer.lifetime, 3600)
+
+    def test_renew_failed(self):
+        self.service._load_access_token.return_value = (None, None)
+        self.service._refresh_access_token.side_effect = WechatError(-1)
+        eq_(self.renewer.renew(), self.renewer.retry_interval)
@@ -0,0 +1,62 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.token_store import (
+    MemoryTokenStore, FileTokenStore, SQLiteTokenStore, KeyValueTokenStore)
+
+
+class _DictClient(object):
+
+    '''A key-value client like memcache.'''
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, time=None):
+        self.values[key] = value
+
+
+class TokenStoreTest(unittest.TestCase):
+
+    '''Creates a TestCase for the token stores.'''
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def check_store(self, store):
+        key = CONST.STRING
+        access_token = CONST.STRING
+        expires_at = CONST.NUMBER
+        ok_(store.get(key) is None)
+        store.set(key, access_token, expires_at)
+        eq_(store.get(key), (access_token, expires_at))
+
+    def test_memory_token_store(self):
+        self.check_store(MemoryTokenStore())
+
+    def test_file_token_store(self):
+        path = os.path.join(self.path, 'token.json')
+        self.check_store(FileTokenStore(path))
+        eq_(len(FileTokenStore(path)._read()), 1)
+
+    def test_sqlite_token_store(self):
+        path = os.path.join(self.path, 'token.db')
+        store = SQLiteTokenStore(path)
+        self.check_store(store)
+        ok_(store._connect() is store._connect())
+
+    def test_key_value_token_store(self):
+        client = _DictClient()
+        self.check_store(KeyValueTokenStore(client, ttl_arg='time'))
+        eq_(len(client.values), 1)
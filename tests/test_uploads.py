@@ -0,0 +1,84 @@
+#-*- coding: utf-8 -*-
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import eq_, ok_
+
+from pywechat.uploads import MultipartStream, Upload, UploadIndex
+
+
+class _Pipe(object):
+
+    '''A stream which can not seek.'''
+
+    def __init__(self, content):
+        self.__buffer = io.BytesIO(content)
+
+    def read(self, size=-1):
+        return self.__buffer.read(size)
+
+
+class UploadTest(unittest.TestCase):
+
+    '''Creates a TestCase for the uploads.'''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.content = os.urandom(200000)
+        self.path = os.path.join(self.directory, 'logo.png')
+        with open(self.path, 'wb') as image:
+            image.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_upload(self):
+        digest = hashlib.sha256(self.content).hexdigest()
+        with Upload(self.path) as upload:
+            eq_(upload.digest, digest)
+            eq_(upload.size, len(self.content))
+            eq_(upload.filename, 'logo.png')
+            eq_(upload.read_at(10, 5), self.content[10:15])
+        ok_(upload.file.closed)
+
+        stream = io.BytesIO(b'x' + self.content)
+        stream.seek(1)
+        with Upload(stream, 'logo.jpg') as upload:
+            eq_(upload.digest, digest)
+            eq_(upload.read_at(0, 3), self.content[:3])
+        ok_(not stream.closed)
+
+        with Upload(_Pipe(self.content)) as upload:
+            eq_(upload.digest, digest)
+            eq_(upload.filename, 'media')
+
+    def test_multipart_stream(self):
+        with Upload(self.path) as upload:
+            stream = MultipartStream('buffer', upload)
+            body = b''
+            while True:
+                chunk = stream.read(7000)
+                if not chunk:
+                    break
+                body += chunk
+            eq_(len(body), stream.len)
+            head, rest = body.split(b'\r\n\r\n', 1)
+            ok_(b'name="buffer"; filename="logo.png"' in head)
+            ok_(b'Content-Type: image/png' in head)
+            eq_(rest, self.content + '\r\n--{0}--\r\n'.format(
+                stream.boundary).encode('utf-8'))
+
+            stream.seek(0)
+            eq_(stream.read(), body)
+            stream.seek(-10, os.SEEK_END)
+            eq_(stream.read(), body[-10:])
+
+    def test_upload_index(self):
+        index = UploadIndex(os.path.join(self.directory, 'uploads.db'))
+        ok_(index.get('card_image', 'digest') is None)
+        index.set('card_image', 'digest', 'url')
+        eq_(index.get('card_image', 'digest'), 'url')
+        ok_(index.get('shake_material', 'digest') is None)
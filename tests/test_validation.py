@@ -0,0 +1,91 @@
+#-*- coding: utf-8 -*-
+import io
+import struct
+import unittest
+from nose.tools import eq_, ok_
+from .constants import CONST
+
+from pywechat.excepts import ValidationError, WechatError
+from pywechat.validation import (
+    CARD_URL, SHAKE_URL, Validator, get_image_size)
+
+
+def make_png(width, height):
+    return b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + \
+        struct.pack('>II', width, height) + b'\x08\x06\x00\x00\x00'
+
+
+class ValidatorTest(unittest.TestCase):
+
+    '''Creates a TestCase for the validator of requests.'''
+
+    def setUp(self):
+        self.validator = Validator()
+
+    def assert_invalid(self, url, kwargs, field):
+        with self.assertRaises(ValidationError) as e:
+            self.validator.validate(url, kwargs)
+        eq_(e.exception.field, field)
+        ok_(isinstance(e.exception, WechatError))
+
+    def test_apply_devices(self):
+        url = SHAKE_URL + 'device/applyid'
+        data = {"quantity": 499, "apply_reason": "test", "comment": "test"}
+        self.validator.validate(url, {"data": data})
+        self.assert_invalid(
+            url, {"data": dict(data, quantity=500)}, 'data.quantity')
+        # a chinese character is as wide as two letters.
+        self.validator.validate(
+            url, {"data": dict(data, comment=u'测' * 15)})
+        self.assert_invalid(
+            url, {"data": dict(data, comment=u'测' * 15 + u'a')},
+            'data.comment')
+
+    def test_statistics(self):
+        url = SHAKE_URL + 'statistics/page'
+        begin_date = 1438704000
+        self.validator.validate(url, {"data": {
+            "page_id": 1, "begin_date": begin_date,
+            "end_date": begin_date + 29 * 24 * 60 * 60
+        }})
+        self.assert_invalid(url, {"data": {
+            "page_id": 1, "begin_date": begin_date,
+            "end_date": begin_date + 30 * 24 * 60 * 60
+        }}, 'data')
+        self.assert_invalid(url, {"data": {
+            "page_id": 1, "begin_date": begin_date,
+            "end_date": begin_date - 1
+        }}, 'data')
+
+    def test_colors(self):
+        url = CARD_URL + 'update'
+        data = {
+            "card_id": CONST.STRING,
+            "groupon": {"base_info": {"color": "Color999"}}
+        }
+        # the colors are not checked until they are loaded.
+        self.validator.validate(url, {"data": data})
+        self.validator.set_colors({"colors": [
+            {"name": "Color010", "value": "#55bd47"}
+        ]})
+        self.assert_invalid(url, {"data": data}, 'data.*.base_info.color')
+        data["groupon"]["base_info"]["color"] = "Color010"
+        self.validator.validate(url, {"data": data})
+
+    def test_image_size(self):
+        url = SHAKE_URL + 'material/add'
+        image = io.BytesIO(make_png(200, 120))
+        image.seek(0)
+        self.validator.validate(url, {"files": {"media": image}})
+        eq_(image.tell(), 0)
+        self.assert_invalid(
+            url, {"files": {"media": io.BytesIO(make_png(201, 120))}},
+            'files.media')
+
+    def test_get_image_size(self):
+        eq_(get_image_size(make_png(120, 90)), (120, 90))
+        eq_(get_image_size(b'GIF89a' + struct.pack('<HH', 30, 40)), (30, 40))
+        jpeg = b'\xff\xd8' + b'\xff\xe0' + struct.pack('>H', 4) + b'\x00\x00' \
+            + b'\xff\xc0' + struct.pack('>HBHH', 17, 8, 90, 120)
+        eq_(get_image_size(jpeg), (120, 90))
+        ok_(get_image_size(b'text') is None)